@@ -1,7 +1,8 @@
+import os
 from flask import Flask, jsonify
 
 from routes.users import users_bp
-from routes.routers import routers_bp
+from routes.routers import routers_bp, resume_jobs
 from routes.topology import topology_bp
 
 app = Flask(__name__)
@@ -11,4 +12,7 @@ app.register_blueprint(routers_bp, url_prefix="/routers")
 app.register_blueprint(topology_bp, url_prefix="/topologia")
 
 if __name__ == '__main__':
+    # Con el recargador de debug solo el proceso hijo (el que atiende) reanuda los trabajos
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        resume_jobs()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,85 @@
+# Micro-benchmark of the interface join: legacy suffix scans vs the index-keyed
+# join of get_interface_info. Works on synthetic walk results, no SNMP traffic
+# involved.
+#
+#   python3 -m benchmarks.bench_interface_join --sizes 500,1000,2000,5000
+import argparse
+import time
+from snmp.snmp_parser import build_interfaces
+
+IF_TYPE = '1.3.6.1.2.1.2.2.1.3'
+IF_OPER_STATUS = '1.3.6.1.2.1.2.2.1.8'
+IF_NAME = '1.3.6.1.2.1.31.1.1.1.1'
+IP_AD_ENT_IF_INDEX = '1.3.6.1.2.1.4.20.1.2'
+IP_AD_ENT_NET_MASK = '1.3.6.1.2.1.4.20.1.3'
+
+
+# Column walks of a router with n interfaces, one address per interface, as
+# the string (OID, value) pairs the legacy join worked on
+def synthetic_walks(n):
+    ips = synthetic_ips(n)
+    return {
+        "if_types": [(f"{IF_TYPE}.{i}", "6") for i in range(1, n + 1)],
+        "if_statuses": [(f"{IF_OPER_STATUS}.{i}", "1") for i in range(1, n + 1)],
+        "if_names": [(f"{IF_NAME}.{i}", f"Gi0/{i}") for i in range(1, n + 1)],
+        "ip_to_index": [(f"{IP_AD_ENT_IF_INDEX}.{ip}", str(i)) for i, ip in enumerate(ips, 1)],
+        "subnet_masks": [(f"{IP_AD_ENT_NET_MASK}.{ip}", '255.255.255.0') for ip in ips],
+    }
+
+
+# The same router as the rows snmp_table(typed=True) returns to
+# get_interface_info: {index tuple: {field: native value}}
+def synthetic_rows(n):
+    if_rows = {(i,): {"tipo": 6, "estado": 1, "nombre": f"Gi0/{i}".encode()} for i in range(1, n + 1)}
+    ip_rows = {
+        tuple(int(part) for part in ip.split('.')): {"indice": i, "mascara": '255.255.255.0'}
+        for i, ip in enumerate(synthetic_ips(n), 1)
+    }
+    return {"if_rows": if_rows, "ip_rows": ip_rows}
+
+
+def synthetic_ips(n):
+    return [f"10.{i // 65536}.{(i // 256) % 256}.{i % 256}" for i in range(1, n + 1)]
+
+
+# The join get_interface_info used to do: linear suffix scans per interface
+def legacy_join(if_types, if_statuses, if_names, ip_to_index, subnet_masks):
+    interfaces = []
+    for name_oid, name in if_names:
+        index = int(name_oid.split('.')[-1])
+        tipo = next((v for k, v in if_types if k.endswith(f'.{index}')), 'unknown')
+        estado_val = next((v for k, v in if_statuses if k.endswith(f'.{index}')), 'unknown')
+        estado = {'1': 'up', '2': 'down', '3': 'testing'}.get(estado_val, 'unknown')
+        ip = None
+        mask = None
+        for ip_oid, idx in ip_to_index:
+            if int(idx) == index:
+                ip = '.'.join(ip_oid.split('.')[-4:])
+                mask = next((m for k, m in subnet_masks if k.endswith(ip)), None)
+                break
+        interfaces.append({"nombre": name, "numero": index, "tipo": tipo,
+                           "ip": ip or "Unassigned", "mascara": mask or "Unknown", "estado": estado})
+    return interfaces
+
+
+def timed(fn, walks):
+    start = time.perf_counter()
+    result = fn(**walks)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="500,1000,2000,5000")
+    args = parser.parse_args()
+
+    print(f"{'interfaces':>10} {'legado (ms)':>12} {'indexado (ms)':>14}")
+    for n in (int(size) for size in args.sizes.split(',')):
+        legacy, legacy_ms = timed(legacy_join, synthetic_walks(n))
+        indexed, indexed_ms = timed(build_interfaces, synthetic_rows(n))
+        assert legacy == indexed, "Los dos joins deben producir las mismas interfaces"
+        print(f"{n:>10} {legacy_ms:>12.1f} {indexed_ms:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Cost of the rollup/retention pass of one interface series, and a check that
+# the tier files stay sorted when both octet counters are rolled up together
+# (read_tier_range relies on it). Works on a synthetic series, no SNMP traffic.
+# Runs past RAW_RETENTION by default, so the last hours include pruning.
+#
+#   python3 -m benchmarks.bench_rollup --hours 30 --interval 5
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from config import ROLLUP_INTERVAL, RAW_RETENTION, RETENTION_SLACK
+from services import rates
+from services.timeseries import TimeSeries
+
+
+def sample(t, entrada, salida):
+    return {
+        "timestamp": rates.iso_timestamps([t])[0],
+        "uptime": int(t * 100),
+        "contadores": {"entrada": entrada, "salida": salida},
+        "bits": {"entrada": 64, "salida": 64}
+    }
+
+
+# Every tier file must be sorted by inicio, and a range query must return the
+# same buckets for both counters
+def check_tiers(series, start, end):
+    for name, (step, _, store) in series.tiers.items():
+        if not os.path.exists(store.filename):
+            continue
+        with open(store.filename) as f:
+            starts = [json.loads(line)["inicio"] for line in f]
+        assert starts == sorted(starts), f"El nivel {name} no está ordenado por inicio"
+
+        expected = sorted({inicio for inicio in starts if start <= inicio < end})
+        rows = series.read_tier_range(name, start, end)
+        for column in rates.RATE_COLUMNS:
+            found = [row["inicio"] for row in rows if row["contador"] == column]
+            assert found == expected, f"Rango de {column} en {name}: {found[:1]}..{found[-1:]}"
+
+
+# The raw file keeps RAW_RETENTION seconds, plus at most RETENTION_SLACK of
+# the file in expired samples waiting for the next prune
+def check_retention(series, end):
+    oldest = rates.epoch_seconds([series.read()[0]["timestamp"]])[0]
+    assert oldest >= end - RAW_RETENTION / (1 - RETENTION_SLACK) - ROLLUP_INTERVAL, "Muestras crudas vencidas"
+
+
+# Regression case: a pass that closes several buckets of both counters at
+# once (after a restart or a stalled maintenance loop), done twice
+def check_two_passes():
+    series = TimeSeries(os.path.join(tempfile.mkdtemp(prefix="bench_rollup_"), "serie"))
+    start = time.time() - 1800
+    for i in range(0, 1800, 10):
+        series.append(sample(start + i, 1000 * i, 300 * i))
+        if i in (900, 1790):
+            series.maintain(now=start + i)
+    check_tiers(series, rates.iso_timestamps([start + 300])[0], rates.iso_timestamps([start + 1200])[0])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=float, default=30)
+    parser.add_argument("--interval", type=float, default=5, help="segundos entre muestras")
+    args = parser.parse_args()
+
+    series = TimeSeries(os.path.join(tempfile.mkdtemp(prefix="bench_rollup_"), "serie"))
+    start = time.time() - args.hours * 3600
+    passes = []
+    entrada = salida = 0
+    t = start
+    next_pass = start + ROLLUP_INTERVAL
+    while t < start + args.hours * 3600:
+        entrada += 125000 * args.interval
+        salida += 40000 * args.interval
+        series.append(sample(t, int(entrada), int(salida)))
+        t += args.interval
+        if t >= next_pass:
+            begin = time.perf_counter()
+            series.maintain(now=t)
+            passes.append((time.perf_counter() - begin) * 1000)
+            next_pass += ROLLUP_INTERVAL
+
+    check_two_passes()
+    middle = start + args.hours * 1800
+    check_tiers(series, rates.iso_timestamps([middle])[0], rates.iso_timestamps([middle + 900])[0])
+    check_retention(series, t)
+
+    samples = int(args.hours * 3600 / args.interval)
+    print(f"{samples} muestras, {len(passes)} pasadas de mantenimiento")
+    print(f"pasada p50 {statistics.median(passes):.1f} ms, primera hora {statistics.mean(passes[:60]):.1f} ms, "
+          f"última hora {statistics.mean(passes[-60:]):.1f} ms, máx {max(passes):.1f} ms")
+    print("Niveles ordenados y rangos iguales para entrada y salida")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Per-request latency: fresh SnmpEngine/transport per call vs the shared runtime.
+#
+#   python3 -m benchmarks.bench_snmp_engine                 # local fake agent
+#   python3 -m benchmarks.bench_snmp_engine --host 192.168.100.1 --requests 20
+import argparse
+import asyncio
+import statistics
+import time
+from pysnmp.hlapi.v3arch.asyncio import (
+    SnmpEngine, UdpTransportTarget, CommunityData,
+    ContextData, ObjectType, ObjectIdentity, get_cmd
+)
+from benchmarks.fake_agent import FakeAgent, synthetic_router
+from snmp.snmp_runtime import SnmpRuntime
+from snmp.snmp_sender import RouterSNMPClient
+
+SYS_NAME = '1.3.6.1.2.1.1.5.0'
+
+
+# Behaviour before the shared runtime: new engine and transport on every GET
+async def legacy_get(host, port, community):
+    snmpEngine = SnmpEngine()
+    transport = await UdpTransportTarget.create((host, port))
+    result = await get_cmd(
+        snmpEngine,
+        CommunityData(community, mpModel=1),
+        transport,
+        ContextData(),
+        ObjectType(ObjectIdentity(SYS_NAME))
+    )
+    snmpEngine.close_dispatcher()
+    return result
+
+
+def measure(fn, requests):
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<22} media={statistics.mean(samples):7.2f} ms  "
+          f"p50={statistics.median(samples):7.2f} ms  p95={p95:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int, default=161)
+    parser.add_argument("--community", default="public")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    agent = None
+    host, port = args.host, args.port
+    if host is None:
+        agent = FakeAgent(synthetic_router()).start()
+        host, port = agent.address
+
+    # One asyncio.run() per request, as the Flask views used to do
+    legacy = measure(lambda: asyncio.run(legacy_get(host, port, args.community)), args.requests)
+
+    runtime = SnmpRuntime()
+    client = RouterSNMPClient(host, "bench", args.community, port, runtime=runtime)
+    runtime.run(client.snmp_get(SYS_NAME))  # warm-up: engine + transport creation
+    shared = measure(lambda: runtime.run(client.snmp_get(SYS_NAME)), args.requests)
+    runtime.close()
+
+    print(f"GET sysName.0 contra {host}:{port} ({args.requests} solicitudes)")
+    report("motor por solicitud", legacy)
+    report("runtime compartido", shared)
+
+    if agent:
+        agent.stop()
+
+
+if __name__ == "__main__":
+    main()
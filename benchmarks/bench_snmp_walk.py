@@ -0,0 +1,59 @@
+# Round trips and wall time of a GETNEXT walk vs a GETBULK walk, and of
+# a full get_interface_info() built on the multi-column table walk.
+#
+#   python3 -m benchmarks.bench_snmp_walk --interfaces 500
+#   python3 -m benchmarks.bench_snmp_walk --host 192.168.100.1
+import argparse
+import time
+from benchmarks.fake_agent import FakeAgent, synthetic_router
+from snmp.snmp_runtime import SnmpRuntime
+from snmp.snmp_sender import RouterSNMPClient
+
+IF_NAME = '1.3.6.1.2.1.31.1.1.1.1'
+
+
+def walk(runtime, client, bulk):
+    client.round_trips = 0
+    start = time.perf_counter()
+    rows = runtime.run(client.snmp_walk(IF_NAME, bulk=bulk))
+    elapsed = (time.perf_counter() - start) * 1000
+    return len(rows), client.round_trips, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int, default=161)
+    parser.add_argument("--community", default="public")
+    parser.add_argument("--interfaces", type=int, default=500)
+    parser.add_argument("--max-repetitions", type=int, default=25)
+    args = parser.parse_args()
+
+    agent = None
+    host, port = args.host, args.port
+    if host is None:
+        agent = FakeAgent(synthetic_router(args.interfaces)).start()
+        host, port = agent.address
+
+    runtime = SnmpRuntime()
+    client = RouterSNMPClient(host, "bench", args.community, port, runtime=runtime,
+                              max_repetitions=args.max_repetitions)
+
+    print(f"WALK ifName contra {host}:{port}")
+    for label, bulk in (("GETNEXT", False), ("GETBULK", True)):
+        rows, round_trips, elapsed = walk(runtime, client, bulk)
+        print(f"{label:<8} filas={rows:<5} viajes={round_trips:<5} tiempo={elapsed:8.1f} ms")
+
+    client.round_trips = 0
+    start = time.perf_counter()
+    interfaces = runtime.run(client.get_interface_info())
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"get_interface_info interfaces={len(interfaces)} viajes={client.round_trips} tiempo={elapsed:.1f} ms")
+
+    runtime.close()
+    if agent:
+        agent.stop()
+
+
+if __name__ == "__main__":
+    main()
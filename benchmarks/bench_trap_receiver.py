@@ -0,0 +1,150 @@
+# Trap receiver throughput: runs TrapsService on an unprivileged loopback port
+# and blasts linkUp/linkDown traps at it at each rate, reporting sustained
+# throughput, decode latency and where traps were lost. Every interface flaps,
+# so with --damping nearly all traps end up suppressed.
+#
+#   python3 -m benchmarks.bench_trap_receiver
+#   python3 -m benchmarks.bench_trap_receiver --rates 1000,5000,20000 --varbinds 10 --versions 1,2c
+#   python3 -m benchmarks.bench_trap_receiver --rates 1000,5000,20000 --workers 4 --sources 8
+import argparse
+import contextlib
+import os
+import socket
+import tempfile
+import time
+from benchmarks.trap_load import build_messages, blast
+from services.job_registry import JobRegistry
+from services.traps_service import TrapsService
+
+
+# TrapsService that counts the traps it routes and, with the in-process
+# receiver, times every datagram (decode, routing, enqueue). With receiver
+# processes decoding happens in them and no latency is reported
+class TimedTrapsService(TrapsService):
+    def __init__(self, *args, **kwargs):
+        self.decode_ms = []
+        self.received = 0
+        super().__init__(*args, **kwargs)
+
+    def _trap_callback(self, *args):
+        start = time.perf_counter()
+        super()._trap_callback(*args)
+        self.decode_ms.append((time.perf_counter() - start) * 1000)
+
+    def _handle_trap(self, *args):
+        self.received += 1
+        super()._handle_trap(*args)
+
+
+def free_port(address):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind((address, 0))
+        return sock.getsockname()[1]
+
+
+# Records dropped by the writer queue and by the receiver processes' queue
+def queue_dropped(service):
+    return service.dropped + sum(service.worker_dropped)
+
+
+def suppressed_count(service):
+    return service.damper.suppressed if service.damper else 0
+
+
+def percentile(samples, q):
+    return samples[max(0, int(len(samples) * q) - 1)] if samples else 0.0
+
+
+# Waits for the receiver to empty the socket buffer: until no datagram
+# arrives for quiet seconds; returns how many were received
+def wait_received(service, quiet=0.3):
+    received = -1
+    while received != service.received:
+        received = service.received
+        time.sleep(quiet)
+    return received
+
+
+# Waits until every received trap was written or dropped, or timeout seconds
+def wait_drained(service, received_before, timeout=10):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if service.queue.empty() and service.written + service.dropped >= received_before:
+            return
+        time.sleep(0.01)
+
+
+def run(service, address, port, messages, rate, duration, sources):
+    service.decode_ms.clear()
+    received_before = service.received
+    per_worker = list(service.worker_received)
+    written, dropped = service.written, queue_dropped(service)
+    writer_dropped = service.dropped
+    suppressed = suppressed_count(service)
+
+    start = time.perf_counter()
+    sent = blast(address, port, messages, rate, duration, sources)
+    received = wait_received(service) - received_before
+    # Every interface has one capture, so each trap that is not suppressed
+    # becomes exactly one record
+    wait_drained(service, written + writer_dropped + received - (suppressed_count(service) - suppressed))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(service.decode_ms)
+    return {
+        "sent": sent,
+        "received": received,
+        "written": service.written - written,
+        "queue_dropped": queue_dropped(service) - dropped,
+        "suppressed": suppressed_count(service) - suppressed,
+        "elapsed": elapsed,
+        "per_worker": [now - before for now, before in zip(service.worker_received, per_worker)],
+        "latency": [f"{percentile(latencies, q):>7.3f}" if latencies else f"{'-':>7}" for q in (0.5, 0.95, 0.99)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--address", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 = puerto libre")
+    parser.add_argument("--rates", default="500,2000,8000", help="traps por segundo, separados por coma")
+    parser.add_argument("--duration", type=float, default=3)
+    parser.add_argument("--varbinds", type=int, default=3)
+    parser.add_argument("--interfaces", type=int, default=24)
+    parser.add_argument("--versions", default="2c", help="1, 2c o 1,2c")
+    parser.add_argument("--workers", type=int, default=0, help="procesos receptores; 0 = hilo")
+    parser.add_argument("--sources", type=int, default=8, help="sockets de origen (routers simulados)")
+    parser.add_argument("--damping", action="store_true", help="amortiguar el flapping (TRAP_DAMPING)")
+    args = parser.parse_args()
+
+    port = args.port or free_port(args.address)
+    messages = build_messages(args.interfaces, args.varbinds, args.versions.split(","))
+
+    # Trap files and the registry go to a temporary directory
+    os.chdir(tempfile.mkdtemp(prefix="bench_traps_"))
+    registry = JobRegistry("trabajos.json")
+    for if_index in range(1, args.interfaces + 1):
+        registry.put("trap", args.address, f"Fa{if_index}/0", ip=args.address, ifIndex=if_index)
+
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        service = TimedTrapsService([], registry=registry, address=args.address, port=port,
+                                    workers=args.workers, damping=args.damping)
+        service.resume_captures()
+        time.sleep(0.5 + args.workers)  # Receivers binding the port
+
+    receiver = f"{args.workers} procesos" if args.workers else "hilo"
+    print(f"Receptor ({receiver}) en {args.address}:{port}, {args.varbinds} varbinds, versiones {args.versions}, "
+          f"{len(messages[0])} bytes por trap, {args.sources} sockets de origen")
+    print(f"{'tasa':>8} {'enviados':>9} {'recibidos':>9} {'escritos':>9} {'perd. socket':>12} "
+          f"{'desc. cola':>10} {'suprimidos':>10} {'sostenido/s':>11} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7}" + ("  por proceso" if args.workers else ""))
+    for rate in (int(rate) for rate in args.rates.split(",")):
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            result = run(service, args.address, port, messages, rate, args.duration, args.sources)
+        print(f"{rate:>8} {result['sent']:>9} {result['received']:>9} {result['written']:>9} "
+              f"{result['sent'] - result['received']:>12} {result['queue_dropped']:>10} {result['suppressed']:>10} "
+              f"{result['written'] / result['elapsed']:>11.0f} {' '.join(result['latency'])}"
+              + (f"  {'/'.join(str(count) for count in result['per_worker'])}" if args.workers else ""))
+
+
+if __name__ == "__main__":
+    main()
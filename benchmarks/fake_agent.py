@@ -0,0 +1,103 @@
+# Minimal SNMPv2c agent over loopback used by the benchmarks.
+# Serves GET / GETNEXT / GETBULK from an in-memory sorted table and counts
+# every request PDU it answers, so benchmarks can compare round trips.
+import bisect
+import socket
+import threading
+from pyasn1.codec.ber import decoder, encoder
+from pysnmp.proto import api
+
+pMod = api.PROTOCOL_MODULES[api.SNMP_VERSION_2C]
+
+
+# Builds a synthetic router MIB with n interfaces (ifTable, ifXTable, ipAddrTable)
+def synthetic_router(n_interfaces=24, sys_name="R-bench"):
+    table = {
+        (1, 3, 6, 1, 2, 1, 1, 1, 0): pMod.OctetString(b"Cisco IOS Software, benchmark agent"),
+        (1, 3, 6, 1, 2, 1, 1, 3, 0): pMod.TimeTicks(123456),
+        (1, 3, 6, 1, 2, 1, 1, 5, 0): pMod.OctetString(sys_name),
+        (1, 3, 6, 1, 2, 1, 31, 1, 5, 0): pMod.TimeTicks(100),
+    }
+    for i in range(1, n_interfaces + 1):
+        table[(1, 3, 6, 1, 2, 1, 2, 2, 1, 2, i)] = pMod.OctetString(f"FastEthernet{i}/0")
+        table[(1, 3, 6, 1, 2, 1, 2, 2, 1, 3, i)] = pMod.Integer(6)
+        table[(1, 3, 6, 1, 2, 1, 2, 2, 1, 8, i)] = pMod.Integer(1 if i % 3 else 2)
+        table[(1, 3, 6, 1, 2, 1, 2, 2, 1, 10, i)] = pMod.Counter32(i * 1000)
+        table[(1, 3, 6, 1, 2, 1, 2, 2, 1, 16, i)] = pMod.Counter32(i * 2000)
+        for column in (11, 13, 14, 17, 19, 20):  # Unicast packets, discards, errors
+            table[(1, 3, 6, 1, 2, 1, 2, 2, 1, column, i)] = pMod.Counter32(i * column)
+        table[(1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 1, i)] = pMod.OctetString(f"Fa{i}/0")
+        table[(1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 6, i)] = pMod.Counter64(i * 1000)
+        table[(1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 10, i)] = pMod.Counter64(i * 2000)
+        table[(1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 7, i)] = pMod.Counter64(i * 11)
+        table[(1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 11, i)] = pMod.Counter64(i * 17)
+        ip = (10, i // 256, i % 256, 1)
+        table[(1, 3, 6, 1, 2, 1, 4, 20, 1, 2) + ip] = pMod.Integer(i)
+        table[(1, 3, 6, 1, 2, 1, 4, 20, 1, 3) + ip] = pMod.IpAddress("255.255.255.0")
+    return table
+
+
+class FakeAgent:
+    def __init__(self, table, host="127.0.0.1", port=0):
+        self.table = table
+        self.oids = sorted(table)
+        self.requests = 0                 # Request PDUs answered (round trips)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.address = self.sock.getsockname()
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.sock.close()
+
+    def _next(self, oid):
+        pos = bisect.bisect_right(self.oids, oid)
+        if pos < len(self.oids):
+            return self.oids[pos]
+        return None
+
+    def _answer(self, reqPDU):
+        varBinds = []
+        if reqPDU.isSameTypeWith(pMod.GetRequestPDU()):
+            for oid, _ in pMod.apiPDU.get_varbinds(reqPDU):
+                value = self.table.get(tuple(oid), pMod.NoSuchInstance(""))
+                varBinds.append((oid, value))
+        elif reqPDU.isSameTypeWith(pMod.GetNextRequestPDU()):
+            for oid, _ in pMod.apiPDU.get_varbinds(reqPDU):
+                nxt = self._next(tuple(oid))
+                varBinds.append((nxt or oid, self.table[nxt] if nxt else pMod.EndOfMibView("")))
+        elif reqPDU.isSameTypeWith(pMod.GetBulkRequestPDU()):
+            nonRep = pMod.apiBulkPDU.get_non_repeaters(reqPDU)
+            maxRep = pMod.apiBulkPDU.get_max_repetitions(reqPDU)
+            cols = [tuple(oid) for oid, _ in pMod.apiBulkPDU.get_varbinds(reqPDU)]
+            for oid in cols[:nonRep]:
+                nxt = self._next(oid)
+                varBinds.append((nxt or oid, self.table[nxt] if nxt else pMod.EndOfMibView("")))
+            cursors = cols[nonRep:]
+            for _ in range(maxRep if cursors else 0):
+                for pos, oid in enumerate(cursors):
+                    nxt = self._next(oid)
+                    if nxt is None:
+                        varBinds.append((oid, pMod.EndOfMibView("")))
+                    else:
+                        varBinds.append((nxt, self.table[nxt]))
+                        cursors[pos] = nxt
+        return varBinds
+
+    def _serve(self):
+        while True:
+            try:
+                wholeMsg, address = self.sock.recvfrom(65535)
+            except OSError:
+                return
+            reqMsg, _ = decoder.decode(wholeMsg, asn1Spec=pMod.Message())
+            reqPDU = pMod.apiMessage.get_pdu(reqMsg)
+            rspMsg = pMod.apiMessage.get_response(reqMsg)
+            rspPDU = pMod.apiMessage.get_pdu(rspMsg)
+            pMod.apiPDU.set_varbinds(rspPDU, self._answer(reqPDU))
+            self.requests += 1
+            self.sock.sendto(encoder.encode(rspMsg), address)
@@ -0,0 +1,112 @@
+# SNMPv1/v2c linkUp/linkDown trap generator for load tests.
+#
+#   python3 -m benchmarks.trap_load --port 1162 --rate 2000 --duration 5
+import argparse
+import itertools
+import socket
+import time
+from pyasn1.codec.ber import encoder
+from pysnmp.proto import api
+
+LINK_DOWN = (1, 3, 6, 1, 6, 3, 1, 1, 5, 3)
+LINK_UP = (1, 3, 6, 1, 6, 3, 1, 1, 5, 4)
+SNMP_TRAP_OID = (1, 3, 6, 1, 6, 3, 1, 1, 4, 1, 0)
+IF_INDEX = (1, 3, 6, 1, 2, 1, 2, 2, 1, 1)
+IF_ADMIN_STATUS = (1, 3, 6, 1, 2, 1, 2, 2, 1, 7)
+IF_OPER_STATUS = (1, 3, 6, 1, 2, 1, 2, 2, 1, 8)
+CISCO_ENTERPRISE = (1, 3, 6, 1, 4, 1, 9)
+
+
+# Encoded linkUp/linkDown trap for ifIndex if_index with varbinds varbinds:
+# ifIndex, ifAdminStatus and ifOperStatus first, then enterprise padding strings
+def encode_trap(version, if_index, up, varbinds=3, community="public"):
+    pMod = api.PROTOCOL_MODULES[version]
+    status = 1 if up else 2
+    binds = [
+        (IF_INDEX + (if_index,), pMod.Integer(if_index)),
+        (IF_ADMIN_STATUS + (if_index,), pMod.Integer(1)),
+        (IF_OPER_STATUS + (if_index,), pMod.Integer(status)),
+    ][:varbinds]
+    for extra in range(max(0, varbinds - 3)):
+        binds.append((CISCO_ENTERPRISE + (2, 1, extra), pMod.OctetString(f"FastEthernet{if_index}/{extra}")))
+
+    if version == api.SNMP_VERSION_1:
+        pdu = pMod.TrapPDU()
+        pMod.apiTrapPDU.set_defaults(pdu)
+        pMod.apiTrapPDU.set_enterprise(pdu, CISCO_ENTERPRISE)
+        pMod.apiTrapPDU.set_generic_trap(pdu, 3 if up else 2)
+        pMod.apiTrapPDU.set_varbinds(pdu, binds)
+    else:
+        pdu = pMod.SNMPv2TrapPDU()
+        pMod.apiTrapPDU.set_defaults(pdu)
+        trap_oid = (SNMP_TRAP_OID, pMod.ObjectIdentifier(LINK_UP if up else LINK_DOWN))
+        # Defaults hold sysUpTime.0 and snmpTrapOID.0; the latter is replaced
+        defaults = pMod.apiTrapPDU.get_varbinds(pdu)[:1]
+        pMod.apiTrapPDU.set_varbinds(pdu, defaults + [trap_oid] + binds)
+
+    msg = pMod.Message()
+    pMod.apiMessage.set_defaults(msg)
+    pMod.apiMessage.set_community(msg, community)
+    pMod.apiMessage.set_pdu(msg, pdu)
+    return encoder.encode(msg)
+
+
+# Pre-encoded messages alternating linkDown/linkUp over interfaces 1..interfaces,
+# mixing v1 and v2c when both versions are requested
+def build_messages(interfaces=24, varbinds=3, versions=("2c",), community="public"):
+    codes = {"1": api.SNMP_VERSION_1, "2c": api.SNMP_VERSION_2C}
+    return [
+        encode_trap(codes[version], if_index, up, varbinds, community)
+        for if_index in range(1, interfaces + 1)
+        for up in (False, True)
+        for version in versions
+    ]
+
+
+# Sends messages round-robin to (host, port) at rate traps/s for duration
+# seconds, pacing every millisecond; returns the number of traps sent.
+# Each of the sources sockets stands for one router: SO_REUSEPORT picks the
+# receiver process by hashing the source address and port, so traps from a
+# single socket would all land on the same process
+def blast(host, port, messages, rate, duration, sources=8):
+    socks = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(max(1, sources))]
+    sent = 0
+    cycle = itertools.cycle(messages)
+    start = time.perf_counter()
+    try:
+        while True:
+            elapsed = time.perf_counter() - start
+            if elapsed >= duration:
+                break
+            due = int(rate * elapsed) - sent
+            for i in range(sent, sent + due):
+                socks[i % len(socks)].sendto(next(cycle), (host, port))
+            sent += max(due, 0)
+            time.sleep(0.001)
+    finally:
+        for sock in socks:
+            sock.close()
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=162)
+    parser.add_argument("--rate", type=int, default=1000, help="traps por segundo")
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--varbinds", type=int, default=3)
+    parser.add_argument("--interfaces", type=int, default=24)
+    parser.add_argument("--versions", default="2c", help="1, 2c o 1,2c")
+    parser.add_argument("--community", default="public")
+    parser.add_argument("--sources", type=int, default=8, help="sockets de origen (routers simulados)")
+    args = parser.parse_args()
+
+    messages = build_messages(args.interfaces, args.varbinds, args.versions.split(","), args.community)
+    sent = blast(args.host, args.port, messages, args.rate, args.duration, args.sources)
+    print(f"Enviados {sent} traps a {args.host}:{args.port} desde {args.sources} sockets en {args.duration} s "
+          f"({sent / args.duration:.0f}/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -35,3 +35,67 @@ ROUTERS = [
         "rol": "Hoja"
     }
 ]
+
+
+# SNMP
+SNMP_MAX_REPETITIONS = 25  # Filas solicitadas por cada PDU GETBULK
+SNMP_FLEET_CONCURRENCY = 10  # Routers consultados en paralelo en GET /routers/
+SNMP_ROUTER_DEADLINE = 5  # Segundos máximos de consulta por router
+INTERFACE_CATALOG_MAX_AGE = 300  # Segundos de validez del catálogo si el agente no tiene ifTableLastChange
+
+# Topología
+TOPOLOGY_CONCURRENCY = 8  # Routers consultados en paralelo por nivel
+TOPOLOGY_MAX_HOPS = None  # Saltos máximos desde el router semilla (None = sin límite)
+
+# Caché de respuestas de los endpoints de solo lectura (segundos)
+RESPONSE_CACHE_TTL = {
+    "routers": 30,      # GET /routers/
+    "router": 30,       # GET /routers/<host>
+    "interfaces": 15    # GET /routers/<host>/interfaces
+}
+RESPONSE_CACHE_STALE = 60  # Tiempo extra en que se sirve la copia vieja mientras se refresca
+
+# Monitoreo
+SAMPLE_FLUSH_BATCH = 10  # Muestras acumuladas antes de escribir a disco
+SAMPLE_FLUSH_INTERVAL = 5  # Segundos máximos que una muestra espera en memoria
+MONITOR_MAX_VARBINDS = 40  # OIDs por cada GET combinado de un router
+MONITOR_JITTER = 0.1  # Desfase inicial aleatorio de cada router (fracción del intervalo)
+MONITOR_LATE_TOLERANCE = 0.1  # Retraso tolerado antes de contar un sondeo como tardío (fracción del intervalo)
+RATE_BUCKET = 60  # Segundos por bucket al agregar la tasa (promedio, máximo, p95)
+
+# Retención de las series de monitoreo (segundos)
+RAW_RETENTION = 86400  # Muestras crudas
+ROLLUP_TIERS = {  # nivel: (segundos por bucket, retención); cada nivel se agrega a partir del anterior
+    "1m": (60, 7 * 86400),
+    "1h": (3600, 365 * 86400)
+}
+ROLLUP_INTERVAL = 60  # Segundos entre pasadas de agregación y retención
+RETENTION_SLACK = 0.1  # Fracción de un archivo que puede estar vencida antes de reescribirlo sin ella
+
+# Registro de trabajos
+JOB_REGISTRY_FILE = "data/trabajos.json"  # Monitoreos y capturas de traps activos, reanudados al iniciar
+RESUME_STAGGER = 0.5  # Segundos entre cada monitoreo reanudado, para no consultar todos los routers a la vez
+JOB_RETRY = 5  # Segundos antes de reintentar un trabajo cuyo router no respondió (se duplica en cada intento)
+JOB_RETRY_MAX = 300  # Espera máxima entre reintentos
+
+# Streaming de muestras (SSE)
+STREAM_BUFFER = 120  # Últimas muestras por serie guardadas en memoria para clientes que se conectan
+STREAM_QUEUE_SIZE = 100  # Muestras pendientes por cliente antes de desconectarlo por lento
+STREAM_KEEPALIVE = 15  # Segundos sin muestras antes de enviar un comentario keepalive
+
+# Traps
+TRAP_QUEUE_SIZE = 10000  # Registros de traps en espera de escritura; los que no caben se descartan
+TRAP_BATCH = 500  # Registros máximos escritos por lote
+TRAP_LISTEN_ADDRESS = "0.0.0.0"  # Dirección donde escucha el receptor de traps
+TRAP_LISTEN_PORT = 162  # Puerto del receptor (162 requiere permisos de administrador)
+TRAP_WORKERS = 0  # Procesos receptores con SO_REUSEPORT; 0 = un hilo dentro del proceso de Flask
+
+# Amortiguación de flapping de traps (por router e ifIndex)
+TRAP_DAMPING = True  # Suprime las tormentas de traps y las resume
+TRAP_PENALTY = 1000  # Penalización sumada por cada trap de una interfaz
+TRAP_SUPPRESS = 3000  # Penalización a partir de la cual los traps solo se cuentan
+TRAP_REUSE = 750  # Penalización bajo la cual se vuelven a escribir uno por uno
+TRAP_HALF_LIFE = 30  # Segundos en que la penalización se reduce a la mitad
+TRAP_MAX_PENALTY = 12000  # Tope de la penalización (limita el tiempo de supresión)
+TRAP_SUMMARY_INTERVAL = 60  # Segundos entre resúmenes mientras dura una tormenta
+TRAP_DAMPING_CHECK = 1  # Segundos entre revisiones de resúmenes pendientes
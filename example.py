@@ -3,6 +3,7 @@ from pysnmp.hlapi.v3arch.asyncio import *
 from snmp.snmp_sender import RouterSNMPClient
 from services.routers_service import RouterService
 from services.topology_service import TopologyService
+from snmp.snmp_runtime import get_snmp_runtime
 from config import ROUTERS
 import networkx as nx
 import matplotlib.pyplot as plt
@@ -40,4 +41,4 @@ def plot_network(connections, file_name="network_graph.png"):
     plt.savefig(file_name, format="png")
     print(f"Graph saved as {file_name}")
 
-asyncio.run(run())
+get_snmp_runtime().run(run())
@@ -1,23 +1,32 @@
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, Response, jsonify, request, send_file
 from matplotlib import pyplot as plt
-from config import ROUTERS
+from config import ROUTERS, RESPONSE_CACHE_TTL, RESPONSE_CACHE_STALE, RATE_BUCKET, ROLLUP_TIERS, STREAM_KEEPALIVE
 
 from services.user_service import UserService
 from services.routers_service import RouterService
-from services.monitor_service import MonitorService
+from services.monitor_service import MonitorService, COUNTERS
 from services.traps_service import TrapsService
-import asyncio
-import os
+from services.response_cache import ResponseCache
+from services import rates
+from snmp.snmp_runtime import get_snmp_runtime
 import json
 import io
 
+snmp_runtime = get_snmp_runtime()
 user_service = UserService(ROUTERS)
-router_service = RouterService(ROUTERS)
-monitor_service = MonitorService(ROUTERS)
-traps_service = TrapsService(ROUTERS)
+router_service = RouterService(ROUTERS, runtime=snmp_runtime)
+monitor_service = MonitorService(ROUTERS, runtime=snmp_runtime)
+traps_service = TrapsService(ROUTERS, runtime=snmp_runtime)
+response_cache = ResponseCache(runtime=snmp_runtime)
 
 routers_bp = Blueprint('routers', __name__)
 
+# Reanuda los monitoreos y capturas de traps que seguían activos al detener el servicio
+def resume_jobs():
+    monitores = monitor_service.resume_jobs()
+    capturas = traps_service.resume_captures()
+    print(f"Trabajos reanudados: {monitores} monitoreos, {capturas} capturas de traps")
+
 @routers_bp.route("/<host>/usuarios", methods=["GET"])
 def get_users_by_router(host):
     users = user_service.get_users_by_router(host)
@@ -61,41 +70,85 @@ def delete_user_by_router(host):
         return jsonify({"error": f"Router {host} no encontrado"}), 404
     return jsonify([deleted]), 200
 
+@routers_bp.route("/metricas", methods=["GET"])
+def get_metricas():
+    return jsonify({
+        "catalogo_interfaces": router_service.catalog.stats(),
+        "snmp": {"viajes": snmp_runtime.round_trips},
+        "monitoreos_activos": len(monitor_service.active_jobs()),
+        "sondeos_por_router": len(monitor_service.pollers),
+        "streaming": monitor_service.stream.stats(),
+        "traps": traps_service.stats()
+    }), 200
+
+# Sondeos, sondeos tardíos y perdidos de cada monitoreo activo
+@routers_bp.route("/monitoreos", methods=["GET"])
+def get_monitoreos():
+    return jsonify(monitor_service.get_job_stats()), 200
+
+# Serves a read-only SNMP response through the response cache; returns the
+# value and the headers that tell the client how old it is
+def cached_response(endpoint, key, loader):
+    ttl = RESPONSE_CACHE_TTL[endpoint]
+    info, age, state = response_cache.get(key, loader, ttl, RESPONSE_CACHE_STALE)
+    headers = {
+        "Age": str(int(age)),
+        "X-Cache": state,
+        "Cache-Control": f"max-age={ttl}, stale-while-revalidate={RESPONSE_CACHE_STALE}"
+    }
+    return info, headers
+
+@routers_bp.route("/cache", methods=["DELETE"])
+def invalidar_cache():
+    host = request.args.get("host")
+    eliminadas = response_cache.invalidate(host)
+    router_service.catalog.invalidate(host)
+    return jsonify({
+        "message": f"Caché invalidada para {host or 'todos los routers'}",
+        "entradas_eliminadas": eliminadas
+    }), 200
+
 @routers_bp.route("/", methods=["GET"])
 def get_routers_snmp_info():
-    info = asyncio.run(router_service.get_all_router_info())
+    info, headers = cached_response("routers", ("routers",), router_service.get_all_router_info)
     
-    return jsonify(info), 200
+    return jsonify(info), 200, headers
 
 @routers_bp.route("/<host>", methods=["GET"])
 def get_router_snmp_info(host):
-    info = asyncio.run(router_service.get_router_info(host))
+    info, headers = cached_response("router", ("router", host), lambda: router_service.get_router_info(host))
 
     if info is None:
         return jsonify({"error": f"Router {host} no encontrado"}), 404  
     
-    return jsonify(info), 200
+    return jsonify(info), 200, headers
 
 @routers_bp.route("/<host>/interfaces", methods=["GET"])
 def get_interface_info(host):
-    info = asyncio.run(router_service.get_interface_info(host))
+    info, headers = cached_response("interfaces", ("interfaces", host), lambda: router_service.get_interface_info(host))
 
     if info is None:
         return jsonify({"error": f"Router {host} no encontrado"}), 404  
     
-    return jsonify(info), 200
+    return jsonify(info), 200, headers
 
 # Rutas para MonitorService
 @routers_bp.route("/<host>/interfaces/<path:interfaz>/octetos/<int:tiempo>", methods=["POST"])
 def iniciar_monitoreo_octetos(host, interfaz, tiempo):
     duracion = request.args.get("duration", default=60, type=int)
     print("duracion obtenida:", duracion)
-    ok = monitor_service.start_monitoring(host, interfaz, tiempo, duracion)
+    contadores = request.args.get("contadores", default="entrada").split(",")
+    invalidos = [nombre for nombre in contadores if nombre not in COUNTERS]
+    if invalidos:
+        return jsonify({"error": f"Contadores inválidos: {', '.join(invalidos)}. Use: {', '.join(COUNTERS)}"}), 400
+
+    ok = monitor_service.start_monitoring(host, interfaz, tiempo, duracion, contadores)
     if ok:
         return jsonify({
             "message": f"Monitoreo iniciado en {interfaz} del router {host}",
             "intervalo": tiempo,
             "duracion": duracion,
+            "contadores": contadores,
             "estado": "activo"
         }), 200
     else:
@@ -104,29 +157,73 @@ def iniciar_monitoreo_octetos(host, interfaz, tiempo):
             "estado": "en conflicto"
         }), 400
 
+# Parámetros opcionales: from/to (ISO o epoch), step (segundos), agg (min, avg, max, p95), limit y
+# contador (entrada, salida). Sin step devuelve las muestras crudas; con step, la tasa en bps del
+# contador agregada por bucket
 @routers_bp.route("/<host>/interfaces/<path:interfaz>/octetos", methods=["GET"])
 def obtener_datos_monitoreo_octetos(host, interfaz):
-    filename = f"data/{host.replace('.', '_')}_{interfaz.replace('/', '_')}.json"
-
-    if not os.path.exists(filename):
+    try:
+        desde = rates.to_iso(request.args["from"]) if "from" in request.args else None
+        hasta = rates.to_iso(request.args["to"]) if "to" in request.args else None
+    except ValueError:
+        return jsonify({"error": "from y to deben ser fechas ISO o segundos epoch"}), 400
+
+    paso = request.args.get("step", type=int)
+    agregacion = request.args.get("agg", default="avg")
+    limite = request.args.get("limit", type=int)
+    contador = request.args.get("contador", default="entrada")
+    if paso is not None and paso <= 0:
+        return jsonify({"error": "step debe ser mayor a cero"}), 400
+    if agregacion not in rates.AGGREGATIONS:
+        return jsonify({"error": f"agg inválido, use uno de: {', '.join(rates.AGGREGATIONS)}"}), 400
+    if limite is not None and limite <= 0:
+        return jsonify({"error": "limit debe ser mayor a cero"}), 400
+    if contador not in rates.RATE_COLUMNS:
+        return jsonify({"error": f"contador inválido, use uno de: {', '.join(rates.RATE_COLUMNS)}"}), 400
+
+    data = monitor_service.query_octets(host, interfaz, desde, hasta, paso, agregacion, limite, contador)
+
+    if data is None:
         return jsonify({"error": "No hay datos almacenados para esta interfaz"}), 404
 
-    with open(filename, "r") as f:
-        data = json.load(f)
-
     return jsonify(data), 200
 
+# Server-Sent Events: envía cada muestra nueva de la interfaz en cuanto se registra. Al conectarse
+# (o reconectarse con Last-Event-ID) se reenvían las últimas muestras guardadas en memoria
+@routers_bp.route("/<host>/interfaces/<path:interfaz>/octetos/stream", methods=["GET"])
+def stream_monitoreo_octetos(host, interfaz):
+    key = (host, interfaz)
+    subscriber = monitor_service.stream.subscribe(key, request.headers.get("Last-Event-ID"))
+
+    def evento(sample):
+        return f"id: {sample['timestamp']}\ndata: {json.dumps(sample)}\n\n"
+
+    def eventos():
+        try:
+            for sample in subscriber.replay:
+                yield evento(sample)
+            while not subscriber.dropped:
+                sample = subscriber.get(STREAM_KEEPALIVE)
+                yield evento(sample) if sample is not None else ": keepalive\n\n"
+            yield "event: desconectado\ndata: {\"error\": \"Cliente demasiado lento\"}\n\n"
+        finally:
+            monitor_service.stream.unsubscribe(key, subscriber)
+
+    return Response(eventos(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
 @routers_bp.route("/<host>/interfaces/<path:interfaz>/octetos", methods=["DELETE"])
 def detener_monitoreo_octetos(host, interfaz):
     ok = monitor_service.stop_monitoring(host, interfaz)
 
-    filename = f"data/{host.replace('.', '_')}_{interfaz.replace('/', '_')}.json"
-
     if ok:
+        store = monitor_service.get_store(host, interfaz)
         return jsonify({
             "message": f"Monitoreo detenido en {interfaz} del router {host}",
             "estado": "detenido",
-            "archivo_guardado": os.path.exists(filename)
+            "archivo_guardado": store is not None and store.exists()
         }), 200
     else:
         return jsonify({
@@ -134,29 +231,63 @@ def detener_monitoreo_octetos(host, interfaz):
             "estado": "inexistente"
         }), 400
 
+# Tasa en bps del contador (entrada o salida) con promedio, máximo y p95 por bucket de `paso` segundos
+@routers_bp.route("/<host>/interfaces/<path:interfaz>/tasa", methods=["GET"])
+def obtener_tasa_monitoreo(host, interfaz):
+    paso = request.args.get("paso", default=RATE_BUCKET, type=int)
+    contador = request.args.get("contador", default="entrada")
+    if paso <= 0:
+        return jsonify({"error": "El paso debe ser mayor a cero"}), 400
+    if contador not in rates.RATE_COLUMNS:
+        return jsonify({"error": f"contador inválido, use uno de: {', '.join(rates.RATE_COLUMNS)}"}), 400
+
+    data = monitor_service.get_rates(host, interfaz, paso, contador)
+    if data is None:
+        return jsonify({"error": "No hay datos almacenados para esta interfaz"}), 404
+
+    return jsonify(data), 200
+
+# Resumen por minuto u hora (mínimo, promedio y máximo en bps)
+@routers_bp.route("/<host>/interfaces/<path:interfaz>/resumen/<nivel>", methods=["GET"])
+def obtener_resumen_monitoreo(host, interfaz, nivel):
+    if nivel not in ROLLUP_TIERS:
+        return jsonify({"error": f"Nivel inválido, use uno de: {', '.join(ROLLUP_TIERS)}"}), 400
+
+    data = monitor_service.get_rollups(host, interfaz, nivel)
+    if data is None:
+        return jsonify({"error": "No hay datos almacenados para esta interfaz"}), 404
+
+    return jsonify(data), 200
+
 @routers_bp.route("/<host>/interfaces/<path:interfaz>/grafica", methods=["GET"])
 def obtener_grafica_monitoreo(host, interfaz):
-    filename = f"data/{host.replace('.', '_')}_{interfaz.replace('/', '_')}.json"
-    if not os.path.exists(filename):
+    paso = request.args.get("paso", default=RATE_BUCKET, type=int)
+    contador = request.args.get("contador", default="entrada")
+    if paso <= 0:
+        return jsonify({"error": "El paso debe ser mayor a cero"}), 400
+    if contador not in rates.RATE_COLUMNS:
+        return jsonify({"error": f"contador inválido, use uno de: {', '.join(rates.RATE_COLUMNS)}"}), 400
+
+    data = monitor_service.get_rates(host, interfaz, paso, contador)
+    if data is None:
         return jsonify({"error": "No hay datos monitoreados para graficar"}), 404
 
-    with open(filename, "r") as f:
-        data = json.load(f)
-
-    if not data:
-        return jsonify({"error": "El archivo existe pero no contiene datos"}), 400
+    if not data["buckets"]:
+        return jsonify({"error": "No hay muestras suficientes para calcular la tasa"}), 400
 
     # Extrae datos
-    tiempos = [entry["timestamp"] for entry in data]
-    octetos = [entry["octetos"] for entry in data]
+    tiempos = [bucket["inicio"] for bucket in data["buckets"]]
 
     # Genera gráfica
     plt.figure(figsize=(10, 6))
-    plt.plot(tiempos, octetos, marker='o', linestyle='-')
+    plt.plot(tiempos, [bucket["promedio_bps"] for bucket in data["buckets"]], marker='o', linestyle='-', label="Promedio")
+    plt.plot(tiempos, [bucket["p95_bps"] for bucket in data["buckets"]], linestyle='--', label="p95")
+    plt.plot(tiempos, [bucket["max_bps"] for bucket in data["buckets"]], linestyle=':', label="Máximo")
     plt.xticks(rotation=45)
-    plt.title(f"Monitoreo de Octetos en {interfaz} ({host})")
+    plt.title(f"Tráfico de {contador} en {interfaz} ({host}), buckets de {paso} s")
     plt.xlabel("Tiempo")
-    plt.ylabel("Octetos")
+    plt.ylabel("bps")
+    plt.legend()
     plt.tight_layout()
 
     # Guarda en buffer en memoria
@@ -213,13 +344,10 @@ def detener_traps_interfaz(host, interfaz):
 # Grafica Traps
 @routers_bp.route("/<host>/interfaces/<path:interfaz>/grafica_traps", methods=["GET"])
 def obtener_grafica_traps(host, interfaz):
-    filename = f"data/traps_{host.replace('.', '')}{interfaz.replace('/', '_')}.json"
-    if not os.path.exists(filename):
+    traps = traps_service.get_traps(host, interfaz)
+    if traps is None:
         return jsonify({"error": "No hay traps registrados para graficar"}), 404
     
-    with open(filename, "r") as f:
-        traps = json.load(f)
-    
     if not traps:
         return jsonify({"error":"El archivo existe pero no contiene traps"}), 400
     
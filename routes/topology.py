@@ -2,14 +2,15 @@ from flask import Blueprint, jsonify, request, send_file
 from services.topology_service import TopologyService
 from imageGenerator.matplotImage import MatplotImage 
 from config import ROUTERS
-import asyncio
+from snmp.snmp_runtime import get_snmp_runtime
 import threading
 import time
 import os
 import json
 
 topology_bp = Blueprint('topology', __name__)
-service = TopologyService(ROUTERS)
+snmp_runtime = get_snmp_runtime()
+service = TopologyService(ROUTERS, runtime=snmp_runtime)
 
 demonio_thread = None
 demonio_running = False
@@ -18,27 +19,32 @@ demonio_interval = 300  # 5 minutos en segundos
 def demonio_func():
     global demonio_running, demonio_interval
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
     while demonio_running:
         print("Explorando la red...")
 
-        topology_set = loop.run_until_complete(service.get_topology())
+        topology_set = snmp_runtime.run(service.get_topology())
         topology = list(topology_set)
 
         with open("topology.json", "w") as f:
             json.dump(topology, f)
 
+        timings = service.get_discovery_timings()
+        total_ms = sum(t["ms"] for t in timings.values())
+        print(f"Exploración terminada: {len(timings)} routers consultados ({total_ms:.0f} ms acumulados)")
+
         time.sleep(demonio_interval)
 
 @topology_bp.route("/", methods=["GET"])
 def get_topology():
-    topology_set = asyncio.run(service.get_topology())
+    topology_set = snmp_runtime.run(service.get_topology())
     topology = list(topology_set)
 
     return jsonify(topology), 200
 
+@topology_bp.route("/tiempos", methods=["GET"])
+def get_discovery_timings():
+    return jsonify(service.get_discovery_timings()), 200
+
 @topology_bp.route("/", methods=["POST", "PUT"])
 def start_or_update_demonio():
     global demonio_thread, demonio_running, demonio_interval
@@ -65,7 +71,7 @@ def get_image():
         with open("topology.json", "r") as f:
             topology = json.load(f)
     else:
-        topology_set = asyncio.run(service.get_topology())
+        topology_set = snmp_runtime.run(service.get_topology())
         topology = list(topology_set)
 
 
@@ -0,0 +1,80 @@
+import json
+import os
+import threading
+from config import JOB_REGISTRY_FILE
+
+
+# Durable registry of the monitors and trap captures that are running, with
+# the parameters needed to start them again. Every change rewrites the file
+# to a temp file that is swapped in atomically, so a crash leaves either the
+# old or the new registry, never a partial one.
+class JobRegistry:
+    def __init__(self, filename=JOB_REGISTRY_FILE):
+        self.filename = filename
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        self.jobs = self._load()          # "kind|host|interface" -> entry
+
+    def _key(self, kind, host, interface):
+        return f"{kind}|{host}|{interface}"
+
+    # Adds or updates a job; fields of an existing entry are kept unless given
+    def put(self, kind, host, interface, **fields):
+        with self._lock:
+            key = self._key(kind, host, interface)
+            entry = self.jobs.get(key, {"tipo": kind, "host": host, "interfaz": interface})
+            entry.update(fields)
+            self.jobs[key] = entry
+            self._save()
+
+    # Updates fields of several jobs with one write: [(kind, host, interface, fields)]
+    def update_many(self, updates):
+        with self._lock:
+            changed = False
+            for kind, host, interface, fields in updates:
+                entry = self.jobs.get(self._key(kind, host, interface))
+                if entry is not None and any(entry.get(name) != value for name, value in fields.items()):
+                    entry.update(fields)
+                    changed = True
+            if changed:
+                self._save()
+
+    def remove(self, kind, host, interface):
+        with self._lock:
+            if self.jobs.pop(self._key(kind, host, interface), None) is not None:
+                self._save()
+
+    def entries(self, kind):
+        with self._lock:
+            return [dict(entry) for entry in self.jobs.values() if entry["tipo"] == kind]
+
+    def _load(self):
+        if not os.path.exists(self.filename):
+            return {}
+        try:
+            with open(self.filename, "r") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"No se pudo leer el registro de trabajos {self.filename}: {e}")
+            return {}
+
+    def _save(self):
+        tmp = self.filename + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.jobs, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.filename)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+# Registry shared by MonitorService and TrapsService
+def get_job_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = JobRegistry()
+        return _registry
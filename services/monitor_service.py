@@ -1,15 +1,47 @@
 import asyncio
-import time
-import json
 import os
 import threading
+import time
+import numpy as np
 from snmp.snmp_sender import RouterSNMPClient
-from datetime import datetime
+from snmp.snmp_runtime import get_snmp_runtime
+from snmp.interface_catalog import get_interface_catalog
+from snmp import oids
+from services.timeseries import TimeSeries, series_exists
+from services.job_registry import get_job_registry
+from services.sample_stream import SampleStream
+from services.scheduler import JobScheduler
+from services.router_poller import MonitorJob, RouterPoller
+from services import rates
+from config import ROLLUP_INTERVAL, ROLLUP_TIERS, RAW_RETENTION, RESUME_STAGGER, JOB_RETRY, JOB_RETRY_MAX
+
+# Counters a job can poll: (32-bit ifTable column, 64-bit ifXTable column or
+# None when IF-MIB defines no HC version)
+COUNTERS = {
+    "entrada": (oids.IF_IN_OCTETS, oids.IF_HC_IN_OCTETS),
+    "salida": (oids.IF_OUT_OCTETS, oids.IF_HC_OUT_OCTETS),
+    "unicast_entrada": (oids.IF_IN_UCAST_PKTS, oids.IF_HC_IN_UCAST_PKTS),
+    "unicast_salida": (oids.IF_OUT_UCAST_PKTS, oids.IF_HC_OUT_UCAST_PKTS),
+    "errores_entrada": (oids.IF_IN_ERRORS, None),
+    "errores_salida": (oids.IF_OUT_ERRORS, None),
+    "descartes_entrada": (oids.IF_IN_DISCARDS, None),
+    "descartes_salida": (oids.IF_OUT_DISCARDS, None),
+}
+DEFAULT_COUNTERS = ["entrada"]
 
 class MonitorService:
-    def __init__(self, routers):
+    def __init__(self, routers, runtime=None, catalog=None, registry=None):
         self.routers = routers
-        self.tasks = {}
+        self.runtime = runtime or get_snmp_runtime()
+        self.catalog = catalog or get_interface_catalog()  # Shared interface cache
+        self.registry = registry or get_job_registry()     # Survives restarts
+        self.stream = SampleStream()      # Live samples for the streaming endpoint
+        self.scheduler = JobScheduler(self.runtime)         # One loop for every poller
+        self.stores = {}                  # (host, interface) -> TimeSeries
+        self._stores_lock = threading.Lock()
+        self.jobs = {}                    # (host, interface) -> MonitorJob, or the start's token while resolving
+        self._jobs_lock = threading.Lock()
+        self.pollers = {}                 # (host, interval) -> RouterPoller, only touched on the loop
 
     def _get_router(self, host):
         for router in self.routers:
@@ -17,72 +49,319 @@ class MonitorService:
                 return router
         return None
 
+    # Base name of the series files, without extension
     def _get_filename(self, host, interface):
-        filename = f"data/{host.replace('.', '_')}_{interface.replace('/', '_')}.json"
+        filename = f"data/{host.replace('.', '_')}_{interface.replace('/', '_')}"
         os.makedirs("data", exist_ok=True)
         return filename
 
-    async def _monitor_octets(self, host, interface, interval, duration):
-        print(f"Iniciando monitoreo de {interface} en {host} cada {interval} segundos por {duration}")
+    # Time series of an interface (raw samples and rollups), opened once per
+    # process. Only series that are monitored (create) or have files on disk
+    # are opened, so a query for any host or interface in a URL does not add
+    # a store; None otherwise
+    def get_store(self, host, interface, create=False):
+        key = (host, interface)
+        with self._stores_lock:
+            store = self.stores.get(key)
+            if store is None:
+                filename = self._get_filename(host, interface)
+                if not create and not series_exists(filename):
+                    return None
+                store = TimeSeries(filename)
+                self.stores[key] = store
+            return store
+
+    # Stored samples of an interface, or None if it was never monitored
+    def get_samples(self, host, interface):
+        store = self.get_store(host, interface)
+        if store is None or not store.exists():
+            return None
+        return store.read()
+
+    # Traffic rate of an octet counter of an interface in bps, aggregated in
+    # buckets of step seconds; None if it was never monitored
+    def get_rates(self, host, interface, step, column="entrada"):
+        samples = self.get_samples(host, interface)
+        if samples is None:
+            return None
+
+        times, bps, resets = rates.compute_rates(samples, column)
+        return {
+            "paso": step,
+            "contador": column,
+            "muestras": len(samples),
+            "reinicios": resets,
+            "buckets": rates.bucket_rows(rates.aggregate(times, bps, step))
+        }
+
+    # Samples of an interface with timestamp in [start, end) (ISO strings or
+    # None), at most limit of them. Without a step they are the raw counter
+    # samples; with one, the bps rate of the octet counter column aggregated
+    # with agg per bucket of step seconds. None if it was never monitored
+    def query_octets(self, host, interface, start=None, end=None, step=None, agg="avg", limit=None, column="entrada"):
+        store = self.get_store(host, interface)
+        if store is None or not store.exists():
+            return None
+        if step is None:
+            return store.read_range(start, end, limit)
 
-        router = self._get_router(host)
-        if not router:
-            return
+        tier = self._pick_tier(start, step, agg)
+        if tier is None:
+            times, bps, _ = rates.compute_rates(store.read_range(start, end), column)
+            buckets = rates.aggregate(times, bps, step)
+        else:
+            buckets = self._query_tier(store, tier, start, end, step, column)
 
-        client = RouterSNMPClient(router["ip"], router["name"], router.get("community", "public"))
+        points = zip(rates.iso_timestamps(buckets["inicio"]), buckets["muestras"], buckets[rates.AGGREGATIONS[agg]])
+        return {
+            "paso": step,
+            "contador": column,
+            "agregacion": agg,
+            "fuente": tier or "crudo",
+            "datos": [
+                {"inicio": start, "muestras": int(count), "bps": round(float(value), 2)}
+                for start, count, value in list(points)[:limit]
+            ]
+        }
 
-        interfaces = await client.get_interface_info()
-        idx = next((i["numero"] for i in interfaces if i["nombre"] == interface), None)
-        if idx is None:
-            print(f"Interfaz {interface} no encontrada en {host}")
-            return
+    # Coarsest rollup tier that can serve a query: only for ranges starting
+    # before the raw retention, for steps that are a multiple of the tier step
+    # and for aggregations the tiers keep (they have no p95)
+    def _pick_tier(self, start, step, agg):
+        raw_start = rates.iso_timestamps([time.time() - RAW_RETENTION])[0]
+        if agg == "p95" or start is None or start >= raw_start:
+            return None
+        usable = [(tier_step, name) for name, (tier_step, _) in ROLLUP_TIERS.items() if step % tier_step == 0]
+        return max(usable)[1] if usable else None
 
-        oid = f"1.3.6.1.2.1.2.2.1.10.{idx}"
-        filename = self._get_filename(host, interface)
-        
-        start_time = time.time()
-        while time.time() - start_time < duration:
-            value = await client.snmp_get(oid)
-            timestamp = datetime.utcnow().isoformat() + "Z"
+    # Buckets of a range served by a tier: its rows up to the tier watermark,
+    # merged with rates from the raw samples after it (the open bucket and
+    # what the last maintenance pass has not rolled up yet)
+    def _query_tier(self, store, tier, start, end, step, column):
+        watermark = rates.iso_timestamps([store.watermark(tier, column)])[0]
+        tier_end = watermark if end is None else min(end, watermark)
+        times, mins, avgs, maxs, counts = rates.tier_arrays(store.read_tier_range(tier, start, tier_end), column)
 
-            if value is not None:
-                entry = {"timestamp": timestamp, "octetos": int(value)}
+        if end is None or end > watermark:
+            raw = store.read_range(max(start, watermark), end, preceding=1)
+            raw_times, bps, _ = rates.compute_rates(raw, column)
+            times = np.concatenate((times, raw_times))
+            mins, avgs, maxs = (np.concatenate((values, bps)) for values in (mins, avgs, maxs))
+            counts = np.concatenate((counts, np.ones(len(bps), dtype=np.int64)))
+        return rates.rollup(times, step, mins, avgs, maxs, counts)
 
-                if os.path.exists(filename):
-                    with open(filename, "r") as f:
-                        data = json.load(f)
-                else:
-                    data = []
+    # Rollup rows (min/avg/max bps) of one tier; None if it was never monitored
+    def get_rollups(self, host, interface, tier):
+        store = self.get_store(host, interface)
+        if store is None or not store.exists():
+            return None
+        return store.read_tier(tier)
 
-                data.append(entry)
+    # Periodic rollup and retention pass over every open series; the file
+    # work runs in a worker thread so it never stalls the polling loop. The
+    # last sample of each job is saved to the registry on the same pass
+    async def _maintain_stores(self):
+        while True:
+            await asyncio.sleep(ROLLUP_INTERVAL)
+            with self._jobs_lock:
+                jobs = [job for job in self.jobs.values() if isinstance(job, MonitorJob)]
+            self.registry.update_many([
+                ("monitor", job.host, job.interface, {"ultima_muestra": job.last_sample}) for job in jobs
+            ])
 
-                with open(filename, "w") as f:
-                    json.dump(data, f, indent=2)
+            with self._stores_lock:
+                stores = list(self.stores.values())
+            for store in stores:
+                try:
+                    await asyncio.to_thread(store.maintain)
+                except Exception as e:
+                    print(f"Error al mantener la serie {store.raw.filename}: {e}")
 
-                print(f"[{host} - {interface}] Octetos: {value}")
+    # Picks the 64-bit HC version of each counter when the agent has it (the
+    # 32-bit octet counter wraps in about 34 seconds at 1 Gbit/s), probing
+    # all of them in one GET. Returns [(name, oid, counter bits)]
+    async def _select_counters(self, client, idx, names):
+        hc_names = [name for name in names if COUNTERS[name][1] is not None]
+        hc_values = []
+        if hc_names:
+            hc_values = await client.snmp_get_many([COUNTERS[name][1] + (idx,) for name in hc_names], typed=True)
+        has_hc = {name for name, value in zip(hc_names, hc_values or []) if value is not None}
 
-            await asyncio.sleep(interval)
-        print(f"Monitoreo terminado para {interface} en {host} tras {duration} segundos.")
-    def start_monitoring(self, host, interface, interval, duration):
+        return [
+            (name, COUNTERS[name][1] + (idx,), 64) if name in has_hc else (name, COUNTERS[name][0] + (idx,), 32)
+            for name in names
+        ]
+
+    # Resolves the interface and hands the job to the poller of its router and
+    # interval, starting that poller if it is not running yet. token is the
+    # reservation made by start_monitoring: once the key holds anything else
+    # the job was stopped (and maybe started again) and this start is dropped
+    async def _add_job(self, host, interface, interval, duration, counters, token):
         key = (host, interface)
-        if key in self.tasks:
-            return False
+        job = None
+        try:
+            print(f"Iniciando monitoreo de {interface} en {host} cada {interval} segundos por {duration}")
 
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        task = loop.create_task(self._monitor_octets(host, interface, interval, duration))
-        thread = threading.Thread(target=loop.run_forever, daemon=True)
-        thread.start()
+            router = self._get_router(host)
+            if not router:
+                self.registry.remove("monitor", host, interface)
+                return
 
-        self.tasks[key] = task
-        return True
+            client = RouterSNMPClient(router["ip"], router["name"], router.get("community", "public"), runtime=self.runtime)
 
+            ends_at = time.monotonic() + duration
+            idx = await self._resolve_index(key, client, ends_at, token)
+            if idx is None:
+                return
 
-    def stop_monitoring(self, host, interface):
+            selected = await self._select_counters(client, idx, counters)
+            job = MonitorJob(host, interface, selected, self.get_store(host, interface, create=True), interval,
+                             ends_at - time.monotonic())
+
+            with self._jobs_lock:
+                if self.jobs.get(key) is not token:
+                    return  # Stopped while it was being resolved
+                self.jobs[key] = job
+
+            poller_key = (host, interval)
+            poller = self.pollers.get(poller_key)
+            if poller is None:
+                poller = RouterPoller(client, interval, on_job_done=self._job_done, on_sample=self._publish)
+                self.pollers[poller_key] = poller
+                poller.add(job)
+                self.scheduler.start(poller, self._run_poller(poller_key, poller))
+            else:
+                poller.add(job)
+        finally:
+            if job is None:
+                with self._jobs_lock:
+                    if self.jobs.get(key) is token:
+                        del self.jobs[key]
+
+    # ifIndex of the job's interface. While the router does not answer it is
+    # retried with exponential backoff, keeping the registry entry, until the
+    # job ends or its reservation is gone. Returns None if the job is dropped:
+    # the registry entry is removed only when the router answered without the
+    # interface, and never once the key belongs to a newer start
+    async def _resolve_index(self, key, client, ends_at, token):
+        host, interface = key
+        delay = JOB_RETRY
+        while True:
+            try:
+                idx = await self.catalog.get_index(client, interface)
+            except TimeoutError as e:
+                if time.monotonic() + delay >= ends_at:
+                    print(f"{e}; el monitoreo de {interface} terminó sin iniciarse")
+                    self._drop_reservation(key, token)
+                    return None
+                print(f"{e}; reintento del monitoreo de {interface} en {delay} segundos")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, JOB_RETRY_MAX)
+                with self._jobs_lock:
+                    if self.jobs.get(key) is not token:
+                        return None  # Stopped while waiting
+                continue
+
+            if idx is None:
+                print(f"Interfaz {interface} no encontrada en {host}")
+                self._drop_reservation(key, token)
+            return idx
+
+    # Removes a job that never started from the registry, unless it was
+    # stopped or started again meanwhile (the entry is then someone else's)
+    def _drop_reservation(self, key, token):
+        with self._jobs_lock:
+            if self.jobs.get(key) is not token:
+                return
+            del self.jobs[key]
+        self.registry.remove("monitor", *key)
+
+    async def _run_poller(self, poller_key, poller):
+        try:
+            await poller.run()
+        finally:
+            # Runs right after the last job leaves, with no await in between,
+            # so _add_job never joins a poller that already ended
+            if self.pollers.get(poller_key) is poller:
+                del self.pollers[poller_key]
+
+    def _publish(self, job, sample):
+        self.stream.publish((job.host, job.interface), sample)
+
+    def _job_done(self, job):
+        with self._jobs_lock:
+            if self.jobs.get((job.host, job.interface)) is job:
+                del self.jobs[(job.host, job.interface)]
+
+        # A job that ran out its duration leaves the registry (a stopped one
+        # already left it); one still active was cancelled by a shutdown and
+        # stays registered to be resumed
+        if job.active and time.monotonic() >= job.ends_at:
+            self.registry.remove("monitor", job.host, job.interface)
+        elif job.active:
+            self.registry.update_many([("monitor", job.host, job.interface, {"ultima_muestra": job.last_sample})])
+
+    # counters is a list of COUNTERS names, all polled in the same PDU
+    def start_monitoring(self, host, interface, interval, duration, counters=None):
+        counters = counters or DEFAULT_COUNTERS
         key = (host, interface)
-        task = self.tasks.pop(key, None)
-        if task:
-            task.cancel()
-            return True
-        else: 
-            return False
+        with self._jobs_lock:
+            if key in self.jobs:
+                return False
+            token = object()              # Reserves the key until the interface is resolved
+            self.jobs[key] = token
+        self.registry.put("monitor", host, interface, intervalo=interval, contadores=counters,
+                          fin=time.time() + duration)
+        if not self.scheduler.is_running("mantenimiento"):
+            self.scheduler.start("mantenimiento", self._maintain_stores())
+        self.runtime.submit(self._add_job(host, interface, interval, duration, counters, token))
+        return True
+
+    def stop_monitoring(self, host, interface):
+        with self._jobs_lock:
+            if (host, interface) not in self.jobs:
+                return False
+            job = self.jobs.pop((host, interface))
+        self.registry.remove("monitor", host, interface)
+        if isinstance(job, MonitorJob):
+            job.active = False            # Its poller drops it before the next GET
+            job.store.flush()
+        return True
+
+    def active_jobs(self):
+        with self._jobs_lock:
+            return list(self.jobs)
+
+    # Poll counters of every running job (jobs still being resolved are left out)
+    def get_job_stats(self):
+        with self._jobs_lock:
+            jobs = [job for job in self.jobs.values() if isinstance(job, MonitorJob)]
+        return [job.stats() for job in jobs]
+
+    # Starts again the monitors of the registry that still have time left,
+    # RESUME_STAGGER seconds apart and alternating routers, so a restart does
+    # not hit every router at once. Returns the number of monitors resumed
+    def resume_jobs(self):
+        now = time.time()
+        by_router = {}
+        for entry in self.registry.entries("monitor"):
+            if entry["fin"] <= now:
+                self.registry.remove("monitor", entry["host"], entry["interfaz"])
+            else:
+                by_router.setdefault(entry["host"], []).append(entry)
+
+        # Round-robin over the routers: first job of each, then the second...
+        queues = list(by_router.values())
+        entries = [queue[i] for i in range(max(map(len, queues), default=0)) for queue in queues if i < len(queue)]
+        if entries:
+            self.runtime.submit(self._resume(entries))
+        return len(entries)
+
+    async def _resume(self, entries):
+        for i, entry in enumerate(entries):
+            if i:
+                await asyncio.sleep(RESUME_STAGGER)
+            remaining = entry["fin"] - time.time()
+            if remaining > 0:
+                print(f"Reanudando monitoreo de {entry['interfaz']} en {entry['host']} ({remaining:.0f} s restantes)")
+                self.start_monitoring(entry["host"], entry["interfaz"], entry["intervalo"], remaining, entry["contadores"])
@@ -0,0 +1,183 @@
+import numpy as np
+
+MASK_32 = np.uint64(0xFFFFFFFF)
+
+
+# ISO timestamps ("...Z") to float epoch seconds, parsed in one NumPy call
+def epoch_seconds(timestamps):
+    stamps = np.array([t.rstrip("Z") for t in timestamps], dtype="datetime64[us]")
+    return stamps.astype(np.int64) / 1e6
+
+
+def iso_timestamps(seconds):
+    stamps = (np.asarray(seconds) * 1e6).astype(np.int64).astype("datetime64[us]")
+    return [str(stamp) + "Z" for stamp in stamps]
+
+
+# Aggregations accepted by queries -> column of aggregate()/rollup()
+AGGREGATIONS = {"min": "min", "avg": "promedio", "max": "max", "p95": "p95"}
+
+
+# Query bound (ISO timestamp or epoch seconds) in the stored timestamp
+# format, so it can be compared with stored samples as a string.
+# Raises ValueError if it is neither
+def to_iso(value):
+    try:
+        return iso_timestamps([float(value)])[0]
+    except ValueError:
+        return str(np.datetime64(value.rstrip("Z"), "us")) + "Z"
+
+
+# Octet counters whose rate is computed in bps and rolled up
+RATE_COLUMNS = ("entrada", "salida")
+
+
+# (value, bits) of a counter column of a sample, (None, None) if the sample
+# does not have it. Samples written before multi-counter monitoring carry
+# only the input octets, as "octetos" and "contador"
+def counter_value(sample, column):
+    if "contadores" in sample:
+        value = sample["contadores"].get(column)
+        return (value, sample["bits"][column]) if value is not None else (None, None)
+    if column == "entrada":
+        return sample["octetos"], sample.get("contador", 32)
+    return None, None
+
+
+# Bits per second between consecutive samples of an octet counter column.
+#
+# The deltas are taken in uint64, so a 64-bit counter wrap comes out right by
+# itself and a 32-bit one only needs the result masked to 32 bits. A sysUpTime
+# that goes backwards means the agent rebooted and its counters restarted from
+# zero; that interval is dropped, as is a 64-bit counter going down (it cannot
+# wrap in practice) and any interval where the counter width changed.
+#
+# Returns (times, bps, resets): times of the later sample of each valid
+# interval, its rate, and the number of intervals dropped for a reset.
+def compute_rates(samples, column="entrada"):
+    values = [counter_value(s, column) for s in samples]
+    samples = [s for s, (value, _) in zip(samples, values) if value is not None]
+    values = [value for value in values if value[0] is not None]
+    if len(samples) < 2:
+        return np.empty(0), np.empty(0), 0
+
+    times = epoch_seconds([s["timestamp"] for s in samples])
+    counters = np.array([value for value, _ in values], dtype=np.uint64)
+    bits = np.array([width for _, width in values], dtype=np.int64)
+    uptime = np.array([s.get("uptime") if s.get("uptime") is not None else -1 for s in samples], dtype=np.int64)
+
+    delta = counters[1:] - counters[:-1]
+    is_32 = bits[1:] == 32
+    delta = np.where(is_32, delta & MASK_32, delta)
+    elapsed = np.diff(times)
+
+    known_uptime = (uptime[1:] >= 0) & (uptime[:-1] >= 0)
+    rebooted = known_uptime & (uptime[1:] < uptime[:-1])
+    reset_64 = ~is_32 & (counters[1:] < counters[:-1])
+    resets = rebooted | reset_64
+
+    valid = (elapsed > 0) & (bits[1:] == bits[:-1]) & ~resets
+    bps = delta[valid].astype(np.float64) * 8 / elapsed[valid]
+    return times[1:][valid], bps, int(resets.sum())
+
+
+# min/avg/max/p95 of values per bucket of step seconds, all buckets at once:
+# the values are sorted by (bucket, value) and every statistic is read off
+# the bucket boundaries, p95 by nearest rank. Empty buckets are left out.
+def aggregate(times, values, step):
+    if not len(values):
+        return {"inicio": np.empty(0), "muestras": np.empty(0, dtype=np.int64),
+                "min": np.empty(0), "promedio": np.empty(0), "max": np.empty(0), "p95": np.empty(0)}
+
+    buckets = np.floor(np.asarray(times) / step).astype(np.int64)
+    order = np.lexsort((values, buckets))
+    buckets, values = buckets[order], np.asarray(values, dtype=np.float64)[order]
+
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    counts = np.diff(np.r_[starts, len(values)])
+    return {
+        "inicio": buckets[starts] * step,
+        "muestras": counts,
+        "min": values[starts],
+        "promedio": np.add.reduceat(values, starts) / counts,
+        "max": values[starts + counts - 1],
+        "p95": values[starts + np.ceil(0.95 * counts).astype(np.int64) - 1]
+    }
+
+
+# Merges (min, avg, max, count) points into buckets of step seconds: min of
+# the mins, max of the maxes and the count-weighted average. Raw rates are
+# points with min = avg = max and count 1, so the same code rolls rates up
+# into the first tier and each tier up into the next one.
+def rollup(times, step, mins, avgs, maxs, counts=None):
+    if counts is None:
+        counts = np.ones(len(avgs), dtype=np.int64)
+    if not len(avgs):
+        return {"inicio": np.empty(0), "muestras": np.empty(0, dtype=np.int64),
+                "min": np.empty(0), "promedio": np.empty(0), "max": np.empty(0)}
+
+    buckets = np.floor(np.asarray(times) / step).astype(np.int64)
+    order = np.argsort(buckets, kind="stable")
+    buckets = buckets[order]
+    mins, avgs, maxs = (np.asarray(column, dtype=np.float64)[order] for column in (mins, avgs, maxs))
+    counts = np.asarray(counts, dtype=np.int64)[order]
+
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    totals = np.add.reduceat(counts, starts)
+    return {
+        "inicio": buckets[starts] * step,
+        "muestras": totals,
+        "min": np.minimum.reduceat(mins, starts),
+        "promedio": np.add.reduceat(avgs * counts, starts) / totals,
+        "max": np.maximum.reduceat(maxs, starts)
+    }
+
+
+# Aggregation as a list of JSON rows
+def bucket_rows(buckets):
+    return [
+        {
+            "inicio": start,
+            "muestras": int(count),
+            "min_bps": round(float(low), 2),
+            "promedio_bps": round(float(avg), 2),
+            "max_bps": round(float(high), 2),
+            "p95_bps": round(float(p95), 2)
+        }
+        for start, count, low, avg, high, p95 in zip(
+            iso_timestamps(buckets["inicio"]), buckets["muestras"], buckets["min"],
+            buckets["promedio"], buckets["max"], buckets["p95"]
+        )
+    ]
+
+
+# Rollup of a counter column as JSON rows, the record format of the tier files
+def rollup_rows(buckets, column):
+    return [
+        {
+            "inicio": start,
+            "contador": column,
+            "muestras": int(count),
+            "min_bps": round(float(low), 2),
+            "promedio_bps": round(float(avg), 2),
+            "max_bps": round(float(high), 2)
+        }
+        for start, count, low, avg, high in zip(
+            iso_timestamps(buckets["inicio"]), buckets["muestras"], buckets["min"],
+            buckets["promedio"], buckets["max"]
+        )
+    ]
+
+
+# Tier rows of a counter column back into (times, mins, avgs, maxs, counts)
+# arrays for rollup(); rows without "contador" predate multi-counter
+# monitoring and belong to the input octets
+def tier_arrays(rows, column="entrada"):
+    rows = [row for row in rows if row.get("contador", "entrada") == column]
+    return (
+        epoch_seconds([row["inicio"] for row in rows]),
+        np.array([row["min_bps"] for row in rows], dtype=np.float64),
+        np.array([row["promedio_bps"] for row in rows], dtype=np.float64),
+        np.array([row["max_bps"] for row in rows], dtype=np.float64),
+        np.array([row["muestras"] for row in rows], dtype=np.int64)
+    )
@@ -0,0 +1,69 @@
+import threading
+import time
+from snmp.snmp_runtime import get_snmp_runtime
+
+
+# TTL cache for read-only responses built from SNMP queries.
+# - Fresh entries (age < ttl) are served directly.
+# - Stale entries (ttl <= age < ttl + stale) are served while one background
+#   refresh runs on the SNMP runtime (stale-while-revalidate).
+# - Concurrent requests for a key that is being loaded wait on the same
+#   future, so they share one SNMP fetch (request coalescing).
+class ResponseCache:
+    def __init__(self, runtime=None):
+        self.runtime = runtime or get_snmp_runtime()
+        self.entries = {}                 # key -> (value, stored_at)
+        self.inflight = {}                # key -> concurrent Future of the running load
+        self._lock = threading.RLock()    # Re-entrant: a load may finish inside _load()
+
+    # Returns (value, age in seconds, state) where state is HIT, STALE or MISS.
+    # loader is a zero-argument callable returning the coroutine that builds the value
+    def get(self, key, loader, ttl, stale=0):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = time.monotonic() - stored_at
+                if age < ttl:
+                    return value, age, "HIT"
+                if age < ttl + stale:
+                    self._load(key, loader)  # Background refresh, not awaited
+                    return value, age, "STALE"
+
+            future = self._load(key, loader)
+
+        return future.result(), 0, "MISS"
+
+    # Starts a load for key unless one is already running; caller holds the lock
+    def _load(self, key, loader):
+        future = self.inflight.get(key)
+        if future is not None:
+            return future
+
+        future = self.runtime.submit(loader())
+        self.inflight[key] = future
+        future.add_done_callback(lambda done: self._store(key, done))
+        return future
+
+    def _store(self, key, future):
+        with self._lock:
+            self.inflight.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            value = future.result()
+            if value is not None:  # Unknown routers (None) are not cached
+                self.entries[key] = (value, time.monotonic())
+
+    # Drops every entry, or only the ones that include host: keys mentioning
+    # it and fleet-wide keys, which have no host ((endpoint,) vs (endpoint, host))
+    def invalidate(self, host=None):
+        with self._lock:
+            if host is None:
+                removed = len(self.entries)
+                self.entries.clear()
+                return removed
+
+            keys = [key for key in self.entries if host in key or len(key) == 1]
+            for key in keys:
+                del self.entries[key]
+            return len(keys)
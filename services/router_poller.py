@@ -0,0 +1,155 @@
+import asyncio
+import random
+import time
+from datetime import datetime
+from snmp import oids
+from config import MONITOR_MAX_VARBINDS, MONITOR_JITTER, MONITOR_LATE_TOLERANCE
+
+
+def _utc_now():
+    return datetime.utcnow().isoformat() + "Z"
+
+
+# One monitored interface: the counter set polled on it and where its
+# samples go
+class MonitorJob:
+    def __init__(self, host, interface, counters, store, interval, duration):
+        self.host = host
+        self.interface = interface
+        self.names = [name for name, _, _ in counters]   # Counter set, in polling order
+        self.oids = [oid for _, oid, _ in counters]      # Counter instances polled every tick
+        self.bits = {name: bits for name, _, bits in counters}  # 32 or 64-bit, per counter
+        self.store = store                # TimeSeries the samples go to
+        self.interval = interval
+        self.ends_at = time.monotonic() + duration  # Immune to wall-clock jumps
+        self.active = True                # Cleared by stop_monitoring()
+        self.polls = 0                    # Polls that included this job
+        self.late = 0                     # Polls sent later than their deadline allows
+        self.missed = 0                   # Deadlines skipped because a poll overran
+        self.last_sample = None           # Timestamp of the last stored sample
+
+    def expired(self, now):
+        return not self.active or now >= self.ends_at
+
+    def stats(self):
+        return {
+            "host": self.host,
+            "interfaz": self.interface,
+            "intervalo": self.interval,
+            "contadores": self.bits,
+            "sondeos": self.polls,
+            "tardios": self.late,
+            "perdidos": self.missed,
+            "ultima_muestra": self.last_sample,
+            "restante": max(0, round(self.ends_at - time.monotonic(), 1))
+        }
+
+
+# Polls every job of one router that shares the same interval: each tick sends
+# a single multi-varbind GET with every counter of every job (split every
+# MONITOR_MAX_VARBINDS OIDs) and fans the values out to each series with the
+# same timestamp. The poller ends when
+# its last job expires or is stopped.
+#
+# Polls run on a fixed monotonic grid (start + k * interval) instead of
+# sleeping a full interval after each poll, so SNMP latency and disk writes
+# never push the period. Each poller starts at a random offset of up to
+# jitter * interval to spread the load of many routers.
+class RouterPoller:
+    def __init__(self, client, interval, on_job_done=None, on_sample=None, max_varbinds=MONITOR_MAX_VARBINDS,
+                 jitter=MONITOR_JITTER, late_tolerance=MONITOR_LATE_TOLERANCE):
+        self.client = client
+        self.interval = interval
+        self.on_job_done = on_job_done    # Called with each job that leaves the poller
+        self.on_sample = on_sample        # Called with (job, sample) after each stored sample
+        self.max_varbinds = max_varbinds
+        self.jitter = jitter              # Max start offset, as a fraction of the interval
+        self.late_tolerance = late_tolerance  # Delay (fraction of interval) before a poll counts as late
+        self.jobs = {}                    # interface -> MonitorJob
+
+    def __repr__(self):
+        return f"RouterPoller({self.client.host}, {self.interval}s)"
+
+    def add(self, job):
+        previous = self.jobs.get(job.interface)
+        if previous is not None:
+            self._finish(previous)        # Restarted before its old job was dropped
+        self.jobs[job.interface] = job
+
+    async def run(self):
+        deadline = time.monotonic() + random.uniform(0, self.jitter * self.interval)
+        try:
+            while True:
+                await asyncio.sleep(max(0, deadline - time.monotonic()))
+                self._drop_expired()
+                if not self.jobs:
+                    break
+
+                jobs = list(self.jobs.values())
+
+                # Deadlines that passed entirely while the loop was busy (an
+                # overrunning poll or a blocked loop) are skipped, not replayed
+                behind = time.monotonic() - deadline
+                if behind >= self.interval:
+                    missed = int(behind // self.interval)
+                    deadline += missed * self.interval
+                    behind -= missed * self.interval
+                    for job in jobs:
+                        job.missed += missed
+                late = behind > self.late_tolerance * self.interval
+
+                # sysUpTime rides along in the same GET so rate computation can
+                # tell an agent reboot from a counter wrap
+                requested = _utc_now()
+                uptime, *values = await self._poll([oids.SYS_UPTIME] + [oid for job in jobs for oid in job.oids])
+                responded = _utc_now()
+
+                offset = 0
+                for job in jobs:
+                    job_values = values[offset:offset + len(job.oids)]
+                    offset += len(job.oids)
+                    job.polls += 1
+                    job.late += late
+
+                    # One columnar record per tick with every counter of the set
+                    counters = {name: value for name, value in zip(job.names, job_values) if value is not None}
+                    if counters and job.active:
+                        sample = {
+                            "timestamp": requested,   # Poll request time, shared by the router's series
+                            "respuesta": responded,
+                            "uptime": uptime,         # Centiseconds, None if the agent did not answer it
+                            "contadores": counters,
+                            "bits": {name: job.bits[name] for name in counters}
+                        }
+                        job.store.append(sample)
+                        job.last_sample = requested
+                        if self.on_sample:
+                            self.on_sample(job, sample)
+                        print(f"[{job.host} - {job.interface}] Contadores: {counters}")
+
+                deadline += self.interval  # Next point of the grid, not now + interval
+        finally:
+            for job in list(self.jobs.values()):
+                self._finish(job)
+
+    # One GET per chunk of OIDs; values in request order, None where missing
+    async def _poll(self, oid_list):
+        values = []
+        for start in range(0, len(oid_list), self.max_varbinds):
+            chunk = oid_list[start:start + self.max_varbinds]
+            result = await self.client.snmp_get_many(chunk, typed=True)
+            values.extend(result if result is not None else [None] * len(chunk))
+        return values
+
+    def _drop_expired(self):
+        now = time.monotonic()
+        for job in [job for job in self.jobs.values() if job.expired(now)]:
+            self._finish(job)
+
+    def _finish(self, job):
+        self.jobs.pop(job.interface, None)
+        job.store.flush_later()           # Written by the sample writer, not on the loop
+        if job.active:
+            print(f"Monitoreo terminado para {job.interface} en {job.host}.")
+        if self.on_job_done:
+            self.on_job_done(job)
@@ -1,8 +1,17 @@
+import asyncio
 from snmp.snmp_sender import RouterSNMPClient  # Asumo que tu clase RouterSNMPClient está ahí
+from snmp.snmp_runtime import get_snmp_runtime
+from snmp.interface_catalog import get_interface_catalog
+from config import SNMP_FLEET_CONCURRENCY, SNMP_ROUTER_DEADLINE
 
 class RouterService:
-    def __init__(self, routers):
+    def __init__(self, routers, runtime=None, concurrency=SNMP_FLEET_CONCURRENCY,
+                 deadline=SNMP_ROUTER_DEADLINE, catalog=None):
         self.routers = routers
+        self.runtime = runtime or get_snmp_runtime()
+        self.catalog = catalog or get_interface_catalog()  # Shared interface cache
+        self.concurrency = concurrency    # Routers consultados a la vez
+        self.deadline = deadline          # Segundos máximos por router
 
     def _get_router(self, host):
         for router in self.routers:
@@ -10,22 +19,53 @@ class RouterService:
                 return router
         return None
 
+    # Polls the whole fleet concurrently; a router that fails or misses its
+    # deadline is reported as unreachable instead of stalling the response
     async def get_all_router_info(self):
-        routers_info = []
-        for router in self.routers:
-            client = RouterSNMPClient(router["ip"], router["name"], router.get("community", "public"))
-            info = await client.get_general_info(
-                rol=router.get("rol") or "Indefinido",
-                empresa=router.get("empresa") or "Indefinido"
-            )
-            routers_info.append(info)
-        return routers_info
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def poll(router):
+            async with semaphore:
+                return await self._poll_router(router)
+
+        return list(await asyncio.gather(*(poll(router) for router in self.routers)))
+
+    async def _poll_router(self, router):
+        rol = router.get("rol") or "Indefinido"
+        empresa = router.get("empresa") or "Indefinido"
+        client = RouterSNMPClient(router["ip"], router["name"], router.get("community", "public"), runtime=self.runtime)
+
+        try:
+            info = await asyncio.wait_for(client.get_general_info(rol=rol, empresa=empresa), self.deadline)
+        except asyncio.TimeoutError:
+            return self._unreachable(router, rol, empresa, f"Sin respuesta en {self.deadline} segundos")
+        except Exception as e:
+            return self._unreachable(router, rol, empresa, str(e))
+
+        # sysName is always answered by a live agent
+        if info["nombre"] is None:
+            return self._unreachable(router, rol, empresa, "Sin respuesta SNMP")
+
+        info["ip"] = router["ip"]
+        info["estado"] = "alcanzable"
+        return info
+
+    def _unreachable(self, router, rol, empresa, error):
+        print(f"Router {router['ip']} inalcanzable: {error}")
+        return {
+            "nombre": router["name"],
+            "ip": router["ip"],
+            "rol": rol,
+            "empresa": empresa,
+            "estado": "inalcanzable",
+            "error": error
+        }
 
     async def get_router_info(self, host):
         router = self._get_router(host)
         if not router:
             return None
-        client = RouterSNMPClient(router["ip"], router["name"], router.get("community", "public"))
+        client = RouterSNMPClient(router["ip"], router["name"], router.get("community", "public"), runtime=self.runtime)
         
         return await client.get_general_info(
             rol=router.get("rol"),
@@ -37,6 +77,6 @@ class RouterService:
         if not router:
             return None
         
-        client = RouterSNMPClient(router["ip"], router["name"], router.get("community", "public"))
+        client = RouterSNMPClient(router["ip"], router["name"], router.get("community", "public"), runtime=self.runtime)
         
-        return await client.get_interface_info()
+        return await self.catalog.get_interfaces(client)
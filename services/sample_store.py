@@ -0,0 +1,272 @@
+import atexit
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import deque
+from config import SAMPLE_FLUSH_BATCH, SAMPLE_FLUSH_INTERVAL, RETENTION_SLACK
+
+
+# Append-only store of monitoring samples: one JSON object per line (JSONL).
+# Samples are buffered and written in batches, so a poll never rewrites the
+# history. A crash can only leave a partial last line, which is cut off the
+# next time the file is opened.
+#
+# With a writer, due batches are handed to it instead of being written by
+# the thread that appends, so append never touches the disk.
+class SampleStore:
+    def __init__(self, filename, batch=SAMPLE_FLUSH_BATCH, flush_interval=SAMPLE_FLUSH_INTERVAL, writer=None):
+        self.filename = filename
+        self.batch = batch                    # Samples buffered before a write
+        self.flush_interval = flush_interval  # Max seconds a sample stays buffered
+        self.writer = writer                  # SampleWriter that flushes due batches, or None
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self._queued = False                  # Already waiting for the writer
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        self._migrate_legacy()
+        self._recover()
+
+    def append(self, sample):
+        with self._lock:
+            self.buffer.append(sample)
+            due = time.monotonic() - self.last_flush >= self.flush_interval
+            if len(self.buffer) < self.batch and not due:
+                return
+            if self.writer is None:
+                self._flush()
+                return
+        self.flush_later()
+
+    def flush(self):
+        with self._lock:
+            self._queued = False
+            self._flush()
+
+    # Writes the buffer from the writer thread (right away without a writer)
+    def flush_later(self):
+        if self.writer is None:
+            self.flush()
+            return
+        with self._lock:
+            if self._queued:
+                return
+            self._queued = True
+        self.writer.submit(self)
+
+    # Flushed samples followed by the ones still buffered, in order
+    def read(self):
+        with self._lock:
+            samples = []
+            if os.path.exists(self.filename):
+                with open(self.filename, "r") as f:
+                    for line in f:
+                        if not line.endswith("\n"):
+                            continue  # Partial line still being written
+                        try:
+                            samples.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            continue
+            return samples + list(self.buffer)
+
+    # Samples whose field lies in [start, end), at most limit of them, after
+    # the last preceding samples before start. The file is sorted by time, so
+    # the first one is found by binary search over byte offsets and only the
+    # lines inside the range are parsed
+    def read_range(self, field, start=None, end=None, limit=None, preceding=0):
+        with self._lock:
+            earlier = deque(maxlen=preceding)
+            samples = []
+
+            # False once the range is complete
+            def take(sample):
+                if start is not None and sample[field] < start:
+                    earlier.append(sample)
+                    return True
+                if end is not None and sample[field] >= end:
+                    return False
+                samples.append(sample)
+                return limit is None or len(samples) < limit
+
+            if os.path.exists(self.filename):
+                with open(self.filename, "rb") as f:
+                    if start is not None:
+                        offset = self._bisect(f, field, start)
+                        for _ in range(preceding):
+                            offset = self._previous_line(f, offset)
+                        f.seek(offset)
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break  # Partial line still being written
+                        if not take(json.loads(line)):
+                            return list(earlier) + samples
+
+            for sample in self.buffer:
+                if not take(sample):
+                    break
+            return list(earlier) + samples
+
+    # Offset of the first complete line whose field is >= value
+    def _bisect(self, f, field, value):
+        lo, hi = 0, os.fstat(f.fileno()).st_size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            f.seek(mid - 1 if mid else 0)
+            if mid:
+                f.readline()  # Move to the first line starting at or after mid
+            line = f.readline()
+            if line.endswith(b"\n") and json.loads(line)[field] < value:
+                lo = f.tell()
+            else:
+                hi = mid
+
+        f.seek(lo - 1 if lo else 0)
+        if lo:
+            f.readline()
+        return f.tell()
+
+    # Offset of the line before the one starting at offset (0 if there is none)
+    def _previous_line(self, f, offset, chunk=4096):
+        end = offset - 1  # Newline that ends the previous line
+        while end > 0:
+            begin = max(0, end - chunk)
+            f.seek(begin)
+            newline = f.read(end - begin).rfind(b"\n")
+            if newline >= 0:
+                return begin + newline + 1
+            end = begin
+        return 0
+
+    # Drops the samples whose field sorts before cutoff (ISO timestamps sort
+    # as strings), once they make up at least slack of the file; until then
+    # they are kept, so a file is not rewritten on every pass for a few
+    # expired lines. The cutoff is found by binary search and the kept tail is
+    # copied as bytes, without parsing, to a temp file swapped in atomically.
+    # The lock is only held to find the cutoff and for the swap, so appends
+    # are not blocked by the copy. Returns the number of bytes removed
+    def prune(self, field, cutoff, slack=RETENTION_SLACK):
+        with self._lock:
+            if not os.path.exists(self.filename):
+                return 0
+            with open(self.filename, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                offset = self._bisect(f, field, cutoff)
+            if offset == 0 or offset < size * slack:
+                return 0
+
+        # Lines up to size are complete: they were written under the lock
+        tmp = self.filename + ".tmp"
+        with open(self.filename, "rb") as src, open(tmp, "wb") as dst:
+            src.seek(offset)
+            shutil.copyfileobj(src, dst)
+            dst.truncate(size - offset)
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        with self._lock:
+            # Batches flushed during the copy
+            with open(self.filename, "rb") as src, open(tmp, "ab") as dst:
+                src.seek(size)
+                shutil.copyfileobj(src, dst)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(tmp, self.filename)
+        return offset
+
+    # Replaces the whole file with samples, atomically
+    def rewrite(self, samples):
+        with self._lock:
+            self.buffer = []
+            self._replace(json.dumps(sample, separators=(",", ":")) + "\n" for sample in samples)
+
+    def _replace(self, lines):
+        tmp = self.filename + ".tmp"
+        with open(tmp, "w") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.filename)
+
+    def exists(self):
+        return os.path.exists(self.filename) or bool(self.buffer)
+
+    def _flush(self):
+        if self.buffer:
+            lines = "".join(json.dumps(sample, separators=(",", ":")) + "\n" for sample in self.buffer)
+            with open(self.filename, "a") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self.buffer = []
+        self.last_flush = time.monotonic()
+
+    # Cuts a partial last line (a write interrupted by a crash)
+    def _recover(self):
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+                print(f"Recuperado {self.filename}: se descartó una línea incompleta")
+
+    # Converts a JSON array file written by older versions into JSONL
+    def _migrate_legacy(self):
+        legacy = os.path.splitext(self.filename)[0] + ".json"
+        if legacy == self.filename or not os.path.exists(legacy) or os.path.exists(self.filename):
+            return
+        with open(legacy, "r") as f:
+            samples = json.load(f)
+        tmp = self.filename + ".tmp"
+        with open(tmp, "w") as f:
+            for sample in samples:
+                f.write(json.dumps(sample, separators=(",", ":")) + "\n")
+        os.replace(tmp, self.filename)
+        os.remove(legacy)
+
+
+# Single thread that writes the due batches of every store handed to it, so
+# the pollers on the SNMP loop never wait for a write or an fsync. What is
+# still queued at interpreter exit is written then
+class SampleWriter:
+    def __init__(self):
+        self.queue = queue.Queue()
+        threading.Thread(target=self._writer_loop, daemon=True).start()
+        atexit.register(self.close)
+
+    def submit(self, store):
+        self.queue.put(store)
+
+    def _writer_loop(self):
+        while True:
+            self._write(self.queue.get())
+
+    def _write(self, store):
+        try:
+            store.flush()
+        except OSError as e:
+            print(f"Error al escribir {store.filename}: {e}")
+
+    def close(self):
+        try:
+            while True:
+                self._write(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+# Process-wide writer shared by every monitored series
+def get_sample_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = SampleWriter()
+        return _writer
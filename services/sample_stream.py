@@ -0,0 +1,76 @@
+import queue
+import threading
+from collections import deque
+from config import STREAM_BUFFER, STREAM_QUEUE_SIZE
+
+
+# A client of the stream of one series. Its queue is bounded: when it fills
+# up the client is dropped instead of making the poller wait for it
+class Subscriber:
+    def __init__(self, replay, queue_size):
+        self.replay = replay              # Buffered samples sent before the live ones
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    # Next live sample, or None if none arrived within timeout
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+# Fans out each new sample of a (host, interface) series to its live
+# subscribers. The last samples of every series are kept in a ring buffer,
+# so a client that connects or reconnects gets recent history from memory
+# instead of rereading the series file. publish() never blocks.
+class SampleStream:
+    def __init__(self, buffer_size=STREAM_BUFFER, queue_size=STREAM_QUEUE_SIZE):
+        self.buffer_size = buffer_size
+        self.queue_size = queue_size
+        self.buffers = {}                 # key -> deque of the last samples
+        self.subscribers = {}             # key -> set of Subscriber
+        self.dropped = 0                  # Subscribers dropped for being too slow
+        self._lock = threading.Lock()
+
+    def publish(self, key, sample):
+        with self._lock:
+            self.buffers.setdefault(key, deque(maxlen=self.buffer_size)).append(sample)
+            subscribers = list(self.subscribers.get(key, ()))
+
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(sample)
+            except queue.Full:
+                subscriber.dropped = True
+                self.unsubscribe(key, subscriber)
+                with self._lock:
+                    self.dropped += 1
+
+    # New subscriber of a series; its replay holds the buffered samples newer
+    # than last_timestamp (all of them if None)
+    def subscribe(self, key, last_timestamp=None):
+        with self._lock:
+            replay = [
+                sample for sample in self.buffers.get(key, ())
+                if last_timestamp is None or sample["timestamp"] > last_timestamp
+            ]
+            subscriber = Subscriber(replay, self.queue_size)
+            self.subscribers.setdefault(key, set()).add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, key, subscriber):
+        with self._lock:
+            subscribers = self.subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.subscribers[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "series": len(self.buffers),
+                "suscriptores": sum(len(subscribers) for subscribers in self.subscribers.values()),
+                "desconectados": self.dropped
+            }
@@ -0,0 +1,54 @@
+import threading
+from snmp.snmp_runtime import get_snmp_runtime
+
+
+# Runs keyed polling jobs as tasks on the single SNMP runtime loop, so any
+# number of monitors share one thread and one event loop. start() and stop()
+# can be called from any thread (Flask workers); a job is forgotten as soon
+# as its task finishes, whether it completed, failed or was cancelled.
+class JobScheduler:
+    def __init__(self, runtime=None):
+        self.runtime = runtime or get_snmp_runtime()
+        self.jobs = {}                    # key -> concurrent Future of the job task
+        self._lock = threading.Lock()
+
+    # Starts coro as job key; returns False (and discards coro) if key is already running
+    def start(self, key, coro):
+        with self._lock:
+            if key in self.jobs:
+                coro.close()
+                return False
+            future = self.runtime.submit(coro)
+            self.jobs[key] = future
+
+        future.add_done_callback(lambda done: self._finished(key, done))
+        return True
+
+    # Cancels job key; the cancellation is delivered on the runtime loop
+    def stop(self, key):
+        with self._lock:
+            future = self.jobs.pop(key, None)
+        if future is None:
+            return False
+        future.cancel()
+        return True
+
+    def is_running(self, key):
+        with self._lock:
+            return key in self.jobs
+
+    def active(self):
+        with self._lock:
+            return list(self.jobs)
+
+    def stop_all(self):
+        for key in self.active():
+            self.stop(key)
+
+    def _finished(self, key, future):
+        with self._lock:
+            if self.jobs.get(key) is future:
+                del self.jobs[key]
+
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Trabajo {key} terminó con error: {future.exception()}")
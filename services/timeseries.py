@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+import numpy as np
+from config import RAW_RETENTION, ROLLUP_TIERS
+from services.sample_store import SampleStore, get_sample_writer
+from services import rates
+
+
+# True if a series with this base name has raw or rollup files on disk
+def series_exists(base, tiers=ROLLUP_TIERS):
+    return os.path.exists(base + ".jsonl") or any(os.path.exists(f"{base}.{name}.jsonl") for name in tiers)
+
+
+# Time series of one interface: raw counter samples plus rollup tiers of the
+# bps rate of its octet counters (min/avg/max per bucket), each tier in its own append-only file
+# with its own retention. maintain() rolls closed buckets into the tiers and
+# prunes what fell out of retention, so disk usage stays bounded and long
+# ranges are read from a few thousand rollup rows instead of every sample.
+#
+# Files: <base>.jsonl for the raw samples, <base>.<tier>.jsonl per tier.
+class TimeSeries:
+    def __init__(self, base, raw_retention=RAW_RETENTION, tiers=ROLLUP_TIERS):
+        self.raw = SampleStore(base + ".jsonl", writer=get_sample_writer())  # Written off the polling loop
+        self.raw_retention = raw_retention
+        self.tiers = {}                   # name -> (step, retention, SampleStore), finest first
+        self.watermarks = {}              # (tier, column) -> end (epoch) of the last bucket written
+        for name, (step, retention) in tiers.items():
+            store = SampleStore(f"{base}.{name}.jsonl")
+            self.tiers[name] = (step, retention, store)
+            rows = store.read()
+            # Older versions appended each column's rows separately
+            if any(a["inicio"] > b["inicio"] for a, b in zip(rows, rows[1:])):
+                rows.sort(key=lambda row: (row["inicio"], row.get("contador", "entrada")))
+                store.rewrite(rows)
+            for column in rates.RATE_COLUMNS:
+                times = rates.tier_arrays(rows, column)[0]
+                self.watermarks[(name, column)] = times[-1] + step if len(times) else 0
+        self.pending = True               # Samples not rolled up yet
+        self._maintain_lock = threading.Lock()
+
+    # SampleStore interface over the raw samples, used by the pollers
+    def append(self, sample):
+        self.raw.append(sample)
+        self.pending = True
+
+    def flush(self):
+        self.raw.flush()
+
+    def flush_later(self):
+        self.raw.flush_later()
+
+    def read(self):
+        return self.raw.read()
+
+    def exists(self):
+        return self.raw.exists()
+
+    def read_tier(self, name):
+        return self.tiers[name][2].read()
+
+    # Raw samples with timestamp in [start, end) (ISO strings, None = open)
+    def read_range(self, start=None, end=None, limit=None, preceding=0):
+        return self.raw.read_range("timestamp", start, end, limit, preceding)
+
+    # End (epoch) of the rolled-up part of a tier for a column; later points
+    # are only in the raw samples
+    def watermark(self, name, column):
+        return self.watermarks[(name, column)]
+
+    def read_tier_range(self, name, start=None, end=None, limit=None):
+        return self.tiers[name][2].read_range("inicio", start, end, limit)
+
+    # Rolls up and prunes every tier; safe to call from any thread
+    def maintain(self, now=None):
+        now = time.time() if now is None else now
+        with self._maintain_lock:
+            if self.pending:
+                self._rollup(now)
+            self.raw.prune("timestamp", rates.iso_timestamps([now - self.raw_retention])[0])
+            for step, retention, store in self.tiers.values():
+                store.prune("inicio", rates.iso_timestamps([now - retention])[0])
+
+    # Only the samples not rolled up yet are read: from the lowest watermark
+    # of the first tier, plus the sample before it for the first delta
+    def _rollup(self, now):
+        first = next(iter(self.tiers))
+        start = min(self.watermarks[(first, column)] for column in rates.RATE_COLUMNS)
+        samples = self.raw.read_range("timestamp", rates.iso_timestamps([start])[0], preceding=1)
+        if not samples:
+            self.pending = False
+            return
+
+        source_end = rates.epoch_seconds([samples[-1]["timestamp"]])[0]
+        # Raw rates are the first source: one point per interval, min = avg = max
+        sources = {}
+        for column in rates.RATE_COLUMNS:
+            times, bps, _ = rates.compute_rates(samples, column)
+            sources[column] = (times, bps, bps, bps, None)
+
+        open_points = False
+        names = list(self.tiers)
+        for position, name in enumerate(names):
+            step, _, store = self.tiers[name]
+
+            # A bucket is closed once the source has moved past it, or when the
+            # source has been idle for a whole bucket (the monitor ended)
+            boundary = np.floor(source_end / step) * step
+            if now - source_end >= step:
+                boundary += step
+
+            # The rows of every column go to the tier in one pass, ordered by
+            # (inicio, contador), so the file stays sorted for read_range
+            new_rows = []
+            for column, (times, mins, avgs, maxs, counts) in sources.items():
+                closed = times < boundary
+                fresh = times >= self.watermarks[(name, column)]
+                open_points = open_points or bool((fresh & ~closed).any())
+
+                select = fresh & closed
+                buckets = rates.rollup(times[select], step, mins[select], avgs[select], maxs[select],
+                                       counts[select] if counts is not None else None)
+                new_rows.extend(rates.rollup_rows(buckets, column))
+                # Every point before the boundary is rolled up, even if the
+                # column had none, so the next pass reads from here
+                self.watermarks[(name, column)] = max(self.watermarks[(name, column)], boundary)
+
+            new_rows.sort(key=lambda row: (row["inicio"], row["contador"]))
+            for row in new_rows:
+                store.append(row)
+            store.flush()
+
+            # The rows of this tier from the next tier's watermarks on are its source
+            if position + 1 == len(names):
+                break
+            start = min(self.watermarks[(names[position + 1], column)] for column in rates.RATE_COLUMNS)
+            rows = store.read_range("inicio", rates.iso_timestamps([start])[0])
+            if not rows:
+                break
+            sources = {column: rates.tier_arrays(rows, column) for column in rates.RATE_COLUMNS}
+            source_end = rates.epoch_seconds([rows[-1]["inicio"]])[0] + step
+
+        self.pending = open_points
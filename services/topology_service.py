@@ -1,15 +1,21 @@
-from snmp.snmp_sender import RouterSNMPClient
+from snmp.discovery import NetworkDiscovery
+from snmp.snmp_runtime import get_snmp_runtime
 
 class TopologyService:
-    def __init__(self, routers):
+    def __init__(self, routers, runtime=None):
+        self.runtime = runtime or get_snmp_runtime()
         self.router = next((r for r in routers if r.get("name") == "R4.redes.local"), None)
         
         if self.router is None:
             raise ValueError("Router 'R4.redes.local' no encontrado")
+
+        self.discovery = NetworkDiscovery(self.router.get("community", "public"), runtime=self.runtime)
     
     async def get_topology(self):
-        client = RouterSNMPClient(self.router["ip"], self.router["name"], self.router.get("community", "public"))
-        
-        info = await client.discover_network()
+        info = await self.discovery.discover(self.router["ip"], self.router["name"])
+
+        return info
 
-        return info
\ No newline at end of file
+    # Per-router timing of the last discovery
+    def get_discovery_timings(self):
+        return dict(self.discovery.timings)
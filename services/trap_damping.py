@@ -0,0 +1,108 @@
+import threading
+import time
+from datetime import datetime
+from config import (TRAP_PENALTY, TRAP_SUPPRESS, TRAP_REUSE, TRAP_HALF_LIFE, TRAP_MAX_PENALTY,
+                    TRAP_SUMMARY_INTERVAL)
+
+
+# Flap damping of traps per (router IP, ifIndex), in the style of BGP route
+# flap damping: every trap adds a penalty that decays exponentially with
+# half_life. Once the penalty exceeds suppress the interface's traps are only
+# counted; while the storm lasts, and when the penalty decays below reuse,
+# they are written as one summary record holding the counts and the last
+# trap, so the final state of the interface is never lost.
+class FlapDamper:
+    def __init__(self, penalty=TRAP_PENALTY, suppress=TRAP_SUPPRESS, reuse=TRAP_REUSE,
+                 half_life=TRAP_HALF_LIFE, max_penalty=TRAP_MAX_PENALTY,
+                 summary_interval=TRAP_SUMMARY_INTERVAL):
+        self.penalty = penalty
+        self.suppress = suppress
+        self.reuse = reuse
+        self.half_life = half_life
+        self.max_penalty = max_penalty    # Bounds how long an interface stays suppressed
+        self.summary_interval = summary_interval
+        self.states = {}                  # (ip, ifIndex) -> damping state
+        self.suppressed = 0               # Traps counted instead of written
+        self.summaries = 0
+        self._lock = threading.Lock()
+
+    def _decay(self, state, now):
+        state["penalty"] *= 0.5 ** ((now - state["updated"]) / self.half_life)
+        state["updated"] = now
+
+    # Whether record should be written; if not, it is counted in the storm of key
+    def admit(self, key, record, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            state = self.states.get(key)
+            if state is None:
+                state = {"penalty": 0.0, "updated": now, "suprimida": False}
+                self.states[key] = state
+            self._decay(state, now)
+            state["penalty"] = min(state["penalty"] + self.penalty, self.max_penalty)
+
+            if not state["suprimida"]:
+                if state["penalty"] <= self.suppress:
+                    return True
+                state.update(suprimida=True, resumido=now, conteo={}, desde=record["timestamp"])
+
+            if state["desde"] is None:
+                state["desde"] = record["timestamp"]
+            conteo = state["conteo"]
+            conteo[record["type"]] = conteo.get(record["type"], 0) + 1
+            state["ultimo"] = record
+            self.suppressed += 1
+            return False
+
+    # Summary records due at now, as (key, record): one per suppressed
+    # interface every summary_interval, and a last one when it is released.
+    # With force every pending count is summarized (at shutdown). Interfaces
+    # whose penalty has decayed away are forgotten
+    def due_summaries(self, now=None, force=False):
+        now = time.monotonic() if now is None else now
+        due = []
+        with self._lock:
+            for key, state in list(self.states.items()):
+                self._decay(state, now)
+                if not state["suprimida"]:
+                    if state["penalty"] < 1:
+                        del self.states[key]
+                    continue
+
+                released = state["penalty"] < self.reuse
+                if state["conteo"] and (
+                    force or released or now - state["resumido"] >= self.summary_interval
+                ):
+                    due.append((key, self._summary(state, active=not released)))
+                    state.update(resumido=now, conteo={}, desde=None)
+                if released:
+                    state["suprimida"] = False
+            self.summaries += len(due)
+        return due
+
+    # Record of a stretch of suppressed traps; its type and vars are those of
+    # the last trap, so readers that only look at "type" still see the final state
+    def _summary(self, state, active):
+        last = state["ultimo"]
+        conteo = state["conteo"]
+        return {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "type": last["type"],
+            "ifIndex": last["ifIndex"],
+            "vars": last["vars"],
+            "resumen": {
+                "suprimidos": sum(conteo.values()),
+                "por_tipo": dict(conteo),
+                "desde": state["desde"],
+                "hasta": last["timestamp"],
+                "tormenta_activa": active
+            }
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "interfaces_suprimidas": sum(1 for state in self.states.values() if state["suprimida"]),
+                "suprimidos": self.suppressed,
+                "resumenes": self.summaries
+            }
@@ -0,0 +1,152 @@
+# SNMP trap decoding and the receiver process of TrapsService. This module
+# has no side effects on import, so a receiver process loads only what it
+# needs to decode traps, never the Flask app or the other services.
+#
+# A receiver process runs as
+#
+#   python -m services.trap_receiver <address> <port>
+#
+# binds a UDP socket with SO_REUSEPORT, so the kernel spreads the datagrams
+# among the processes sharing the port, and writes the decoded traps to
+# stdout as JSON lines: {"ip", "timestamp", "traps"} per datagram and
+# {"descartados"} with the running total whenever traps are dropped.
+# Messages go to stderr. The process exits when its parent does.
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+from datetime import datetime
+from pyasn1.codec.ber import decoder
+from pysnmp.proto import api
+from snmp import oids
+from config import TRAP_QUEUE_SIZE, TRAP_BATCH
+
+# Varbind columns whose last sub-identifier is the ifIndex the trap is about
+# (linkUp/linkDown carry ifIndex, ifAdminStatus and ifOperStatus)
+TRAP_IF_COLUMNS = {oids.IF_INDEX, oids.IF_DESCR, oids.IF_ADMIN_STATUS, oids.IF_OPER_STATUS, oids.IF_NAME}
+
+
+# Decodes a datagram into its traps as (type, ifIndex, varbinds) tuples
+def decode_traps(wholeMsg):
+    traps = []
+    while wholeMsg:
+        msgVer = int(api.decodeMessageVersion(wholeMsg))
+        if msgVer not in api.PROTOCOL_MODULES:
+            print(f"❌ Versión SNMP no soportada: {msgVer}")
+            break
+
+        pMod = api.PROTOCOL_MODULES[msgVer]
+        reqMsg, wholeMsg = decoder.decode(wholeMsg, asn1Spec=pMod.Message())
+        reqPDU = pMod.apiMessage.get_pdu(reqMsg)
+
+        if not (reqPDU.isSameTypeWith(pMod.TrapPDU()) or reqPDU.isSameTypeWith(pMod.SNMPv2TrapPDU())):
+            break
+
+        varBinds = (
+            pMod.apiTrapPDU.get_varbinds(reqPDU)
+            if msgVer == api.SNMP_VERSION_1
+            else pMod.apiPDU.get_varbinds(reqPDU)
+        )
+
+        trap_type = "desconocido"
+        trap_data = {}
+        if_index = None
+
+        # SNMPv1 carries the trap type in the PDU instead of snmpTrapOID
+        if msgVer == api.SNMP_VERSION_1:
+            generic = int(pMod.apiTrapPDU.get_generic_trap(reqPDU))
+            trap_type = {2: "linkDown", 3: "linkUp"}.get(generic, trap_type)
+
+        for oid, val in varBinds:
+            oid_str = str(oid)
+            val_str = str(val)
+            trap_data[oid_str] = val_str
+
+            oid_tuple = tuple(oid)
+            if oid_tuple[:-1] in TRAP_IF_COLUMNS:
+                if_index = oid_tuple[-1]
+
+            if oid_str == "1.3.6.1.6.3.1.1.4.1.0":
+                if val_str.endswith("linkUp") or val_str == "1.3.6.1.6.3.1.1.5.4":
+                    trap_type = "linkUp"
+                elif val_str.endswith("linkDown") or val_str == "1.3.6.1.6.3.1.1.5.3":
+                    trap_type = "linkDown"
+
+            if oid_str == "1.3.6.1.6.3.1.1.5.3":
+                trap_type = "linkDown"
+            elif oid_str == "1.3.6.1.6.3.1.1.5.4":
+                trap_type = "linkUp"
+
+        traps.append((trap_type, if_index, trap_data))
+    return traps
+
+
+# Receiver process. Decoding never waits for the parent: decoded traps go
+# through a bounded queue to a thread that writes them to stdout in batches,
+# and the ones that do not fit are counted and dropped
+class ReceiverProcess:
+    def __init__(self, address, port, out):
+        self.address = address
+        self.port = port
+        self.out = out                    # Where the decoded traps are written
+        self.events = queue.Queue(maxsize=TRAP_QUEUE_SIZE)
+        self.dropped = 0
+        self.parent = os.getppid()
+
+    def run(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.settimeout(1)
+        try:
+            sock.bind((self.address, self.port))
+        except OSError as e:
+            print(f"❌ Error ligando al puerto {self.port}: {e}")
+            return
+        print(f"🚀 Receptor SNMP (proceso {os.getpid()}) escuchando en {self.address}:{self.port}")
+        threading.Thread(target=self._forward, daemon=True).start()
+
+        while True:
+            try:
+                wholeMsg, (src_ip, _) = sock.recvfrom(65535)
+            except socket.timeout:
+                if os.getppid() != self.parent:
+                    return  # The service process is gone
+                continue
+            timestamp = datetime.utcnow().isoformat() + "Z"
+            try:
+                traps = decode_traps(wholeMsg)
+            except Exception as e:
+                print(f"❌ Trap inválido desde {src_ip}: {e}")
+                continue
+            if not traps:
+                continue
+            try:
+                self.events.put_nowait({"ip": src_ip, "timestamp": timestamp, "traps": traps})
+            except queue.Full:
+                self.dropped += len(traps)
+
+    def _forward(self):
+        reported = 0
+        while True:
+            batch = [self.events.get()]
+            try:
+                while len(batch) < TRAP_BATCH:
+                    batch.append(self.events.get_nowait())
+            except queue.Empty:
+                pass
+            if self.dropped != reported:
+                reported = self.dropped
+                batch.append({"descartados": reported})
+            try:
+                self.out.write("".join(json.dumps(event, separators=(",", ":")) + "\n" for event in batch))
+                self.out.flush()
+            except (BrokenPipeError, ValueError):
+                os._exit(0)  # The service process closed the pipe
+
+
+if __name__ == "__main__":
+    # stdout carries only the events; every print goes to stderr
+    out, sys.stdout = sys.stdout, sys.stderr
+    ReceiverProcess(sys.argv[1], int(sys.argv[2]), out).run()
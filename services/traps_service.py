@@ -1,22 +1,70 @@
 import os
+import sys
 import json
+import atexit
+import queue
+import socket
+import subprocess
 import threading
+import time
 from datetime import datetime
 from pysnmp.carrier.asyncio.dispatch import AsyncioDispatcher
 from pysnmp.carrier.asyncio.dgram import udp
-from pyasn1.codec.ber import decoder
-from pysnmp.proto import api
 import asyncio
-
+from services.job_registry import get_job_registry
+from services.sample_store import SampleStore
+from services.trap_damping import FlapDamper
+from services.trap_receiver import decode_traps
+from snmp.snmp_sender import RouterSNMPClient
+from snmp.snmp_runtime import get_snmp_runtime
+from snmp.interface_catalog import get_interface_catalog
+from config import (TRAP_QUEUE_SIZE, TRAP_BATCH, SNMP_ROUTER_DEADLINE, TRAP_LISTEN_ADDRESS, TRAP_LISTEN_PORT,
+                    TRAP_WORKERS, TRAP_DAMPING, TRAP_DAMPING_CHECK, JOB_RETRY, JOB_RETRY_MAX)
 
 class TrapsService:
-    def __init__(self, routers):
+    def __init__(self, routers, registry=None, runtime=None, catalog=None,
+                 address=TRAP_LISTEN_ADDRESS, port=TRAP_LISTEN_PORT, workers=TRAP_WORKERS,
+                 damping=TRAP_DAMPING):
         self.routers = routers
-        self.active_traps = {}
+        self.address = address            # Where the receiver listens
+        self.port = port
+        self.workers = workers            # Receiver processes; 0 = receiver thread
+        self.active_traps = {}            # (host, interfaz) -> {"ip", "ifIndex"}
+        self.routes = {}                  # router IP -> routing table, rebuilt on every change
+        self._subscriptions_lock = threading.Lock()
+        self.registry = registry or get_job_registry()  # Captures survive restarts
+        self.runtime = runtime or get_snmp_runtime()
+        self.catalog = catalog or get_interface_catalog()  # Cached ifName -> ifIndex
         os.makedirs('data', exist_ok=True)
 
+        # Decoding and persistence are decoupled: the receiver only enqueues
+        # records and a writer thread appends them to disk in batches
+        self.queue = queue.Queue(maxsize=TRAP_QUEUE_SIZE)
+        self.stores = {}                  # (host, interfaz) -> SampleStore of its traps
+        self._stores_lock = threading.Lock()
+        self.dropped = 0                  # Records lost because the queue was full
+        self.written = 0
+        self.batches = 0
+        threading.Thread(target=self._writer_loop, daemon=True).start()
+        atexit.register(self.close)
+
+        # Flapping interfaces are summarized instead of written trap by trap
+        self.damper = FlapDamper() if damping else None
+        if self.damper:
+            threading.Thread(target=self._summaries_loop, daemon=True).start()
+
+        # Receiver processes are started with the first capture (see _start_workers)
+        self.processes = []
+        self.worker_received = []         # Traps routed from each process
+        self.worker_dropped = []          # Traps each process could not hand over
+        self._workers_lock = threading.Lock()
+        if self.workers and not hasattr(socket, "SO_REUSEPORT"):
+            print("SO_REUSEPORT no disponible, se usa un solo receptor")
+            self.workers = 0
+
         # Iniciar el receptor en un hilo separado, con su propio event loop
-        threading.Thread(target=self._start_trap_receiver, daemon=True).start()
+        if not self.workers:
+            threading.Thread(target=self._start_trap_receiver, daemon=True).start()
 
     def _start_background_trap_loop(self):
         loop = asyncio.new_event_loop()
@@ -32,14 +80,14 @@ class TrapsService:
         try:
             dispatcher.register_transport(
                 udp.DOMAIN_NAME,
-                udp.UdpAsyncioTransport().open_server_mode(('0.0.0.0', 162))
+                udp.UdpAsyncioTransport().open_server_mode((self.address, self.port))
             )
         except Exception as e:
-            print(f"❌ Error ligando al puerto 162: {e}")
+            print(f"❌ Error ligando al puerto {self.port}: {e}")
             return
 
         dispatcher.job_started(1)
-        print("🚀 Receptor SNMP escuchando en el puerto 162")
+        print(f"🚀 Receptor SNMP escuchando en {self.address}:{self.port}")
 
         try:
             dispatcher.runDispatcher()
@@ -49,75 +97,250 @@ class TrapsService:
             dispatcher.closeDispatcher()
 
     def _trap_callback(self, transportDispatcher, transportDomain, transportAddress, wholeMsg):
-
         src_ip, _ = transportAddress
-        while wholeMsg:
-            msgVer = int(api.decodeMessageVersion(wholeMsg))
-            if msgVer not in api.PROTOCOL_MODULES:
-                print(f"❌ Versión SNMP no soportada: {msgVer}")
+        timestamp = datetime.utcnow().isoformat() + "Z"
+        for trap in decode_traps(wholeMsg):
+            self._handle_trap(src_ip, timestamp, *trap)
+
+    def _handle_trap(self, src_ip, timestamp, trap_type, if_index, trap_data):
+        record = {
+            "timestamp": timestamp,
+            "type": trap_type,
+            "ifIndex": if_index,
+            "vars": trap_data
+        }
+        # A suppressed trap is only counted by the damper
+        if self.damper and not self.damper.admit((src_ip, if_index), record):
+            return
+
+        print(f"📡 Trap {trap_type} desde {src_ip} @ {timestamp}")
+        for key in self._route(src_ip, if_index):
+            self._enqueue(key, record)
+
+    def _summaries_loop(self):
+        while True:
+            time.sleep(TRAP_DAMPING_CHECK)
+            self._write_summaries(self.damper.due_summaries())
+
+    def _write_summaries(self, summaries):
+        for (src_ip, if_index), summary in summaries:
+            print(f"📡 Resumen: {summary['resumen']['suprimidos']} traps suprimidos de ifIndex {if_index} "
+                  f"desde {src_ip}, último {summary['type']}")
+            for key in self._route(src_ip, if_index):
+                self._enqueue(key, summary)
+
+    # Starts the receiver processes once. They are started with the first
+    # capture rather than at import time, so a process that never captures
+    # traps (like the parent of the debug reloader) does not take a share of
+    # the port's datagrams. Each one is a fresh interpreter running
+    # services.trap_receiver, so it never imports the Flask app or the services
+    def _start_workers(self):
+        with self._workers_lock:
+            if not self.workers or self.processes:
                 return
+            root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            self.worker_received = [0] * self.workers
+            self.worker_dropped = [0] * self.workers
+            for position in range(self.workers):
+                process = subprocess.Popen(
+                    [sys.executable, "-m", "services.trap_receiver", self.address, str(self.port)],
+                    cwd=root, stdout=subprocess.PIPE, text=True
+                )
+                self.processes.append(process)
+                threading.Thread(target=self._events_loop, args=(position, process), daemon=True).start()
+            atexit.register(self._stop_workers)
+
+    # Routes the traps decoded by one receiver process
+    def _events_loop(self, position, process):
+        for line in process.stdout:
+            event = json.loads(line)
+            if "descartados" in event:
+                self.worker_dropped[position] = event["descartados"]
+                continue
+            self.worker_received[position] += len(event["traps"])
+            for trap_type, if_index, trap_data in event["traps"]:
+                self._handle_trap(event["ip"], event["timestamp"], trap_type, if_index, trap_data)
+
+    def _stop_workers(self):
+        for process in self.processes:
+            process.terminate()
+
+    # Subscriptions a trap goes to, by dictionary lookups only. A trap that
+    # names no interface goes to every subscription of the router; captures
+    # whose ifIndex could not be resolved get every trap of their router
+    def _route(self, src_ip, if_index):
+        table = self.routes.get(src_ip)
+        if table is None:
+            return ()
+        if if_index is None:
+            return table["todas"]
+        return table["indices"].get(if_index, ()) + table["sin_indice"]
 
-            pMod = api.PROTOCOL_MODULES[msgVer]
-            reqMsg, wholeMsg = decoder.decode(wholeMsg, asn1Spec=pMod.Message())
-            reqPDU = pMod.apiMessage.get_pdu(reqMsg)
+    # Rebuilds the routing tables from active_traps and swaps them in with a
+    # single assignment, so the receiver thread never sees a partial table
+    def _rebuild_routes(self):
+        routes = {}
+        for key, capture in self.active_traps.items():
+            table = routes.setdefault(capture["ip"], {"indices": {}, "sin_indice": (), "todas": ()})
+            table["todas"] += (key,)
+            if capture["ifIndex"] is None:
+                table["sin_indice"] += (key,)
+            else:
+                table["indices"][capture["ifIndex"]] = table["indices"].get(capture["ifIndex"], ()) + (key,)
+        self.routes = routes
+
+    def _get_router(self, host):
+        for router in self.routers:
+            if router["ip"] == host or router.get("hostname") == host:
+                return router
+        return None
+
+    def _client(self, router):
+        return RouterSNMPClient(router["ip"], router["name"], router.get("community", "public"), runtime=self.runtime)
+
+    # (ifIndex, answered) of a subscribed interface from the interface
+    # catalog; ifIndex is None if the router is unknown or has no such
+    # interface, and answered is False if the router did not answer in time
+    def _resolve_index(self, router, interfaz):
+        if router is None:
+            return None, True
+        try:
+            return self.runtime.run(self.catalog.get_index(self._client(router), interfaz),
+                                    timeout=SNMP_ROUTER_DEADLINE), True
+        except Exception as e:
+            print(f"No se pudo resolver el ifIndex de {interfaz} en {router['ip']}: {e}")
+            return None, False
 
-            if not (reqPDU.isSameTypeWith(pMod.TrapPDU()) or reqPDU.isSameTypeWith(pMod.SNMPv2TrapPDU())):
+    # Resolves again, on the runtime loop, the ifIndex of a capture left
+    # without one, with exponential backoff while its router does not answer.
+    # Until then the capture gets every trap of its router
+    async def _retry_index(self, key):
+        host, interfaz = key
+        router = self._get_router(host)
+        if router is None:
+            return
+        client = self._client(router)
+        delay = JOB_RETRY
+        while True:
+            await asyncio.sleep(delay)
+            if key not in self.active_traps:
+                return  # Stopped while waiting
+            try:
+                if_index = await asyncio.wait_for(self.catalog.get_index(client, interfaz), SNMP_ROUTER_DEADLINE)
+            except Exception as e:
+                delay = min(delay * 2, JOB_RETRY_MAX)
+                print(f"No se pudo resolver el ifIndex de {interfaz} en {router['ip']}: {e}; reintento en {delay} segundos")
+                continue
+
+            if if_index is None:
+                print(f"Interfaz {interfaz} no encontrada en {host}; la captura recibe todos los traps del router")
                 return
+            with self._subscriptions_lock:
+                capture = self.active_traps.get(key)
+                if capture is None:
+                    return
+                capture["ifIndex"] = if_index
+                self._rebuild_routes()
+                self.registry.put("trap", host, interfaz, ifIndex=if_index)
+            print(f"ifIndex de {interfaz} en {host} resuelto: {if_index}")
+            return
 
-            varBinds = (
-                pMod.apiTrapPDU.get_varbinds(reqPDU)
-                if msgVer == api.SNMP_VERSION_1
-                else pMod.apiPDU.get_varbinds(reqPDU)
-            )
+    # Never blocks the receive path: a record that does not fit is counted and dropped
+    def _enqueue(self, key, record):
+        try:
+            self.queue.put_nowait((key, record))
+        except queue.Full:
+            self.dropped += 1
+
+    def _writer_loop(self):
+        while True:
+            batch = [self.queue.get()]
+            self._write_batch(self._drain(batch))
+
+    # Adds whatever is already queued to batch, up to TRAP_BATCH records;
+    # under load the queue fills while a batch is written, so batches grow
+    def _drain(self, batch):
+        try:
+            while len(batch) < TRAP_BATCH:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    # Appends the batch to each file it touches with one write and fsync per file
+    def _write_batch(self, batch):
+        touched = {}
+        for key, record in batch:
+            store = self._get_store(*key, create=True)
+            store.append(record)
+            touched[key] = store
+        for store in touched.values():
+            store.flush()
+        self.written += len(batch)
+        self.batches += 1
+
+    # Writes what is still queued, at interpreter exit, including the
+    # counts of storms still being suppressed
+    def close(self):
+        if self.damper:
+            self._write_summaries(self.damper.due_summaries(force=True))
+        batch = self._drain([])
+        while batch:
+            self._write_batch(batch)
+            batch = self._drain([])
 
-            timestamp = datetime.utcnow().isoformat() + "Z"
-            trap_type = "desconocido"
-            trap_data = {}
-
-            for oid, val in varBinds:
-                oid_str = str(oid)
-                val_str = str(val)
-                trap_data[oid_str] = val_str
-
-                if oid_str == "1.3.6.1.6.3.1.1.4.1.0":
-                    if val_str.endswith("linkUp"):
-                        trap_type = "linkUp"
-                    elif val_str.endswith("linkDown"):
-                        trap_type = "linkDown"
-
-                if oid_str == "1.3.6.1.6.3.1.1.5.3":
-                    trap_type = "linkDown"
-                elif oid_str == "1.3.6.1.6.3.1.1.5.4":
-                    trap_type = "linkUp"
-
-            print(f"📡 Trap {trap_type} desde {src_ip} @ {timestamp}")
-
-            for (host, interfaz), _ in list(self.active_traps.items()):
-                if host == src_ip:
-                    filename = f"data/traps_{host.replace('.', '')}_{interfaz.replace('/', '_')}.json"
-                    traps = []
-                    if os.path.exists(filename):
-                        with open(filename) as f:
-                            traps = json.load(f)
-
-                    traps.append({
-                        "timestamp": timestamp,
-                        "type": trap_type,
-                        "vars": trap_data
-                    })
-
-                    with open(filename, 'w') as f:
-                        json.dump(traps, f, indent=2)
+    def _get_filename(self, host, interfaz):
+        return f"data/traps_{host.replace('.', '')}_{interfaz.replace('/', '_')}.jsonl"
+
+    # Append-only JSONL store of an interface's traps; the JSON array files
+    # of older versions are converted on first use. Only opened for captured
+    # interfaces (create) or ones with a file, None otherwise
+    def _get_store(self, host, interfaz, create=False):
+        key = (host, interfaz)
+        with self._stores_lock:
+            store = self.stores.get(key)
+            if store is None:
+                filename = self._get_filename(host, interfaz)
+                legacy = os.path.splitext(filename)[0] + ".json"
+                if not create and not os.path.exists(filename) and not os.path.exists(legacy):
+                    return None
+                store = SampleStore(filename, batch=TRAP_BATCH)
+                self.stores[key] = store
+            return store
+
+    # Stored traps of an interface, or None if it has none
+    def get_traps(self, host, interfaz):
+        store = self._get_store(host, interfaz)
+        if store is None or not store.exists():
+            return None
+        return store.read()
+
+    def stats(self):
+        stats = {
+            "en_cola": self.queue.qsize(),
+            "capacidad": self.queue.maxsize,
+            "descartados": self.dropped,
+            "escritos": self.written,
+            "lotes": self.batches,
+            "procesos": len(self.processes)
+        }
+        if self.processes:
+            stats["descartados_procesos"] = sum(self.worker_dropped)
+            stats["recibidos_por_proceso"] = list(self.worker_received)
+        if self.damper:
+            stats["amortiguacion"] = self.damper.stats()
+        return stats
 
     def get_interface_trap_status(self, host, interfaz):
         key = (host, interfaz)
         activo = key in self.active_traps
-        filename = f"data/traps_{host.replace('.', '')}_{interfaz.replace('/', '_')}.json"
-        hay_datos = os.path.exists(filename)
+        store = self._get_store(host, interfaz)
+        hay_datos = store is not None and store.exists()
         return {
             "router": host,
             "interfaz": interfaz,
             "captura_activa": activo,
+            "ifIndex": self.active_traps[key]["ifIndex"] if activo else None,
             "archivo_datos": hay_datos
         }
 
@@ -125,12 +348,48 @@ class TrapsService:
         key = (host, interfaz)
         if key in self.active_traps:
             return False
-        self.active_traps[key] = True
+
+        router = self._get_router(host)
+        if_index, answered = self._resolve_index(router, interfaz)
+        capture = {"ip": router["ip"] if router else host, "ifIndex": if_index}
+        # The registry changes under the same lock as active_traps, so a
+        # background resolution never races with a start or a stop
+        with self._subscriptions_lock:
+            if key in self.active_traps:
+                return False
+            self.active_traps[key] = capture
+            self._rebuild_routes()
+            self.registry.put("trap", host, interfaz, **capture)
+        self._start_workers()
+        if not answered:
+            self.runtime.submit(self._retry_index(key))
         return True
 
     def stop_trap_capture(self, host, interfaz):
         key = (host, interfaz)
-        if key in self.active_traps:
+        with self._subscriptions_lock:
+            if key not in self.active_traps:
+                return False
             del self.active_traps[key]
-            return True
-        return False
+            self._rebuild_routes()
+            self.registry.remove("trap", host, interfaz)
+        return True
+
+    # Restores the captures of the registry with their stored ifIndex, so no
+    # router is queried up front; captures stored without one are resolved
+    # again in the background. Returns how many were restored
+    def resume_captures(self):
+        entries = self.registry.entries("trap")
+        with self._subscriptions_lock:
+            for entry in entries:
+                self.active_traps[(entry["host"], entry["interfaz"])] = {
+                    "ip": entry.get("ip", entry["host"]),
+                    "ifIndex": entry.get("ifIndex")
+                }
+            self._rebuild_routes()
+        if entries:
+            self._start_workers()
+        for entry in entries:
+            if entry.get("ifIndex") is None:
+                self.runtime.submit(self._retry_index((entry["host"], entry["interfaz"])))
+        return len(entries)
@@ -0,0 +1,84 @@
+# Breadth-first topology discovery over CDP neighbors
+import asyncio
+import time
+from snmp.snmp_sender import RouterSNMPClient
+from snmp.snmp_runtime import get_snmp_runtime
+from config import TOPOLOGY_CONCURRENCY, TOPOLOGY_MAX_HOPS
+
+
+# Queries every router of a frontier level concurrently (bounded by concurrency)
+# before moving to the next level. Routers are deduplicated both by IP and by
+# system name, since CDP reports a different address for each link of a router
+class NetworkDiscovery:
+    def __init__(self, community='public', port=161, runtime=None,
+                 concurrency=TOPOLOGY_CONCURRENCY, max_hops=TOPOLOGY_MAX_HOPS):
+        self.community = community
+        self.port = port
+        self.runtime = runtime or get_snmp_runtime()
+        self.concurrency = concurrency    # Routers queried at the same time
+        self.max_hops = max_hops          # None means no hop limit
+        self.timings = {}                 # Router name -> query timing of the last run
+
+    async def discover(self, host, name):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        seen_ips = {host}
+        seen_names = {name}
+        discovered = set()
+        connections = set()
+        timings = {}
+
+        frontier = [(host, name)]
+        hops = 0
+
+        while frontier:
+            results = await asyncio.gather(
+                *(self._query(semaphore, timings, ip, router_name, hops) for ip, router_name in frontier)
+            )
+
+            next_frontier = []
+            for router_name, neighbors in results:
+                discovered.add(router_name)
+
+                for neighbor in neighbors:
+                    connections.add((router_name, neighbor["nombre"]))
+
+                    ip = neighbor["ip"]
+                    if not ip or ip in seen_ips or neighbor["nombre"] in seen_names:
+                        continue
+                    seen_ips.add(ip)
+                    seen_names.add(neighbor["nombre"])
+                    next_frontier.append((ip, neighbor["nombre"]))
+
+            hops += 1
+            if self.max_hops is not None and hops > self.max_hops:
+                break
+            frontier = next_frontier
+
+        self.timings = timings
+
+        # Only keep connections where both routers were discovered,
+        # sorted to avoid duplicates (R1,R2) and (R2,R1)
+        return {
+            tuple(sorted((a, b)))
+            for a, b in connections
+            if a in discovered and b in discovered
+        }
+
+    async def _query(self, semaphore, timings, ip, name, hops):
+        async with semaphore:
+            client = RouterSNMPClient(ip, name, self.community, self.port, self.runtime)
+            start = time.perf_counter()
+            try:
+                neighbors = await client.get_router_neighbors()
+            except Exception as e:
+                print(f"Could not access {ip}: {e}")
+                neighbors = []
+
+            timings[name] = {
+                "ip": ip,
+                "saltos": hops,
+                "vecinos": len(neighbors),
+                "ms": round((time.perf_counter() - start) * 1000, 1),
+                "viajes": client.round_trips
+            }
+            return name, neighbors
@@ -0,0 +1,102 @@
+# Per-router cache of the interface catalog (get_interface_info result)
+import asyncio
+import threading
+import time
+from snmp.oids import SYS_UPTIME, IF_TABLE_LAST_CHANGE
+from config import INTERFACE_CATALOG_MAX_AGE
+
+
+# A cached catalog is validated with a single GET of sysUpTime and
+# ifTableLastChange: if the table has not changed and the agent has not
+# rebooted, the cached interfaces are returned without walking any table.
+# Agents without ifTableLastChange fall back to a maximum age.
+class InterfaceCatalog:
+    def __init__(self, max_age=INTERFACE_CATALOG_MAX_AGE):
+        self.max_age = max_age            # Seconds before a catalog is always refreshed
+        self.entries = {}                 # host -> catalog entry
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._locks = {}                  # host -> asyncio.Lock, avoids parallel rebuilds
+        self._mutex = threading.Lock()    # Guards entries against the Flask threads
+
+    # Returns the interfaces of the client's router, walking the tables only when needed
+    async def get_interfaces(self, client):
+        return (await self._load(client))[0]
+
+    # ifIndex of an interface by name, or None if the router does not have it.
+    # Raises TimeoutError if the router did not answer, so an unreachable
+    # router is not taken for one without the interface
+    async def get_index(self, client, interface):
+        interfaces, answered = await self._load(client)
+        if not answered:
+            raise TimeoutError(f"El router {client.host} no respondió")
+        return next((i["numero"] for i in interfaces if i["nombre"] == interface), None)
+
+    # (interfaces, answered): answered is False when the agent answered
+    # neither the validation GET nor the walk; that empty result is not cached
+    async def _load(self, client):
+        lock = self._locks.setdefault(client.host, asyncio.Lock())
+        async with lock:
+            stamp = await client.snmp_get_many([SYS_UPTIME, IF_TABLE_LAST_CHANGE], typed=True)
+            uptime, last_change = stamp if stamp else (None, None)
+
+            with self._mutex:
+                entry = self.entries.get(client.host)
+            if entry and self._is_valid(entry, uptime, last_change):
+                self.hits += 1
+                return entry["interfaces"], True
+
+            self.misses += 1
+            interfaces = await client.get_interface_info()
+            if uptime is None and not interfaces:
+                return interfaces, False
+            with self._mutex:
+                self.entries[client.host] = {
+                    "interfaces": interfaces,
+                    "uptime": uptime,
+                    "last_change": last_change,
+                    "updated": time.monotonic()
+                }
+            return interfaces, True
+
+    def _is_valid(self, entry, uptime, last_change):
+        if uptime is None:
+            return False  # Agent did not answer, the cache cannot be trusted
+        if entry["uptime"] is None or uptime < entry["uptime"]:
+            return False  # sysUpTime went backwards: the agent rebooted
+        if last_change is None or entry["last_change"] is None:
+            return time.monotonic() - entry["updated"] < self.max_age
+        return last_change == entry["last_change"]
+
+    # Drops the cached catalog of one router, or of all of them
+    def invalidate(self, host=None):
+        with self._mutex:
+            if host is None:
+                self.invalidations += len(self.entries)
+                self.entries.clear()
+            elif self.entries.pop(host, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "aciertos": self.hits,
+            "fallos": self.misses,
+            "invalidaciones": self.invalidations,
+            "tasa_aciertos": round(self.hits / total, 3) if total else None,
+            "routers": len(self.entries)
+        }
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+# Process-wide catalog shared by RouterService and MonitorService
+def get_interface_catalog():
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = InterfaceCatalog()
+        return _catalog
@@ -0,0 +1,47 @@
+# Numeric OIDs used by the project, parsed into tuples once at import time.
+# Subtree checks and index extraction work on these tuples directly, so no
+# MIB is ever resolved while querying a router.
+from snmp.snmp_parser import parse_oid
+
+# SNMPv2-MIB system group
+SYS_DESCR = parse_oid('1.3.6.1.2.1.1.1.0')
+SYS_UPTIME = parse_oid('1.3.6.1.2.1.1.3.0')
+SYS_NAME = parse_oid('1.3.6.1.2.1.1.5.0')
+
+# IF-MIB ifTable columns
+IF_INDEX = parse_oid('1.3.6.1.2.1.2.2.1.1')
+IF_DESCR = parse_oid('1.3.6.1.2.1.2.2.1.2')
+IF_TYPE = parse_oid('1.3.6.1.2.1.2.2.1.3')
+IF_ADMIN_STATUS = parse_oid('1.3.6.1.2.1.2.2.1.7')
+IF_OPER_STATUS = parse_oid('1.3.6.1.2.1.2.2.1.8')
+IF_IN_OCTETS = parse_oid('1.3.6.1.2.1.2.2.1.10')
+IF_IN_UCAST_PKTS = parse_oid('1.3.6.1.2.1.2.2.1.11')
+IF_IN_DISCARDS = parse_oid('1.3.6.1.2.1.2.2.1.13')
+IF_IN_ERRORS = parse_oid('1.3.6.1.2.1.2.2.1.14')
+IF_OUT_OCTETS = parse_oid('1.3.6.1.2.1.2.2.1.16')
+IF_OUT_UCAST_PKTS = parse_oid('1.3.6.1.2.1.2.2.1.17')
+IF_OUT_DISCARDS = parse_oid('1.3.6.1.2.1.2.2.1.19')
+IF_OUT_ERRORS = parse_oid('1.3.6.1.2.1.2.2.1.20')
+
+# IF-MIB ifXTable columns and scalars
+IF_NAME = parse_oid('1.3.6.1.2.1.31.1.1.1.1')
+IF_HC_IN_OCTETS = parse_oid('1.3.6.1.2.1.31.1.1.1.6')
+IF_HC_IN_UCAST_PKTS = parse_oid('1.3.6.1.2.1.31.1.1.1.7')
+IF_HC_OUT_OCTETS = parse_oid('1.3.6.1.2.1.31.1.1.1.10')
+IF_HC_OUT_UCAST_PKTS = parse_oid('1.3.6.1.2.1.31.1.1.1.11')
+IF_TABLE_LAST_CHANGE = parse_oid('1.3.6.1.2.1.31.1.5.0')
+
+# IP-MIB ipAddrTable columns
+IP_AD_ENT_IF_INDEX = parse_oid('1.3.6.1.2.1.4.20.1.2')
+IP_AD_ENT_NET_MASK = parse_oid('1.3.6.1.2.1.4.20.1.3')
+
+# CISCO-CDP-MIB cdpCacheTable columns
+CDP_CACHE_ADDRESS = parse_oid('1.3.6.1.4.1.9.9.23.1.2.1.1.4')
+CDP_CACHE_DEVICE_ID = parse_oid('1.3.6.1.4.1.9.9.23.1.2.1.1.6')
+
+
+# Accepts a dotted string or a tuple and returns the tuple form
+def as_oid(oid):
+    if isinstance(oid, tuple):
+        return oid
+    return parse_oid(oid)
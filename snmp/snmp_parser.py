@@ -0,0 +1,98 @@
+# Parsing layer for SNMP table data: OIDs are turned into index tuples once
+# and rows are joined through dictionaries, never by scanning or suffix matching
+from pyasn1.type import univ
+from pysnmp.proto import rfc1902, rfc1905
+
+# Map SNMP ifOperStatus code to human-readable text
+OPER_STATUS = {
+    1: 'up',
+    2: 'down',
+    3: 'testing'
+}
+
+
+# Converts a pysnmp value to a native Python value without going through
+# prettyPrint(): integers, counters, gauges and timeticks -> int,
+# IpAddress -> dotted string, other octet strings -> bytes, OIDs -> tuple.
+# noSuchObject / noSuchInstance / endOfMibView -> None
+def to_native(value):
+    if isinstance(value, (rfc1905.NoSuchObject, rfc1905.NoSuchInstance, rfc1905.EndOfMibView)):
+        return None
+    if isinstance(value, univ.Integer):
+        return int(value)
+    if isinstance(value, rfc1902.IpAddress):
+        return '.'.join(str(octet) for octet in value.asOctets())
+    if isinstance(value, univ.OctetString):
+        return value.asOctets()
+    if isinstance(value, univ.ObjectIdentifier):
+        return tuple(value)
+    if isinstance(value, univ.Null):
+        return None
+    return value.prettyPrint()
+
+
+# Text columns (DisplayString) arrive as bytes on the typed path
+def decode_text(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return value
+
+
+# CDP addresses (cdpCacheAddress) are 4 raw octets for IPv4
+def ip_from_octets(value):
+    if isinstance(value, bytes) and len(value) == 4:
+        return '.'.join(str(octet) for octet in value)
+    return None
+
+
+# '1.3.6.1.2.1.2.2.1.3.11' -> (1, 3, 6, 1, 2, 1, 2, 2, 1, 3, 11)
+def parse_oid(oid):
+    return tuple(int(part) for part in str(oid).strip('.').split('.'))
+
+
+# Maps ifIndex -> (ip, mask) from ipAddrTable rows keyed by IP address index.
+# Interfaces with several addresses keep the lowest one
+def addresses_by_if_index(ip_rows):
+    addresses = {}
+    for ip_index, row in sorted(ip_rows.items()):
+        if "indice" not in row:
+            continue
+        ip = '.'.join(map(str, ip_index))  # The row index is the IP address
+        addresses.setdefault(int(row["indice"]), (ip, row.get("mascara")))
+    return addresses
+
+
+# Joins ifTable/ifXTable rows with ipAddrTable rows in linear time.
+# Rows hold native values (see to_native)
+def build_interfaces(if_rows, ip_rows):
+    addresses = addresses_by_if_index(ip_rows)
+    interfaces = []
+
+    for if_index, row in sorted(if_rows.items()):
+        if "nombre" not in row:
+            continue
+        index = if_index[0]
+        ip, mask = addresses.get(index, (None, None))
+
+        interfaces.append({
+            "nombre": decode_text(row["nombre"]),
+            "numero": index,
+            "tipo": str(row["tipo"]) if row.get("tipo") is not None else 'unknown',
+            "ip": ip or "Unassigned",
+            "mascara": mask or "Unknown",
+            "estado": OPER_STATUS.get(row.get("estado"), 'unknown')
+        })
+
+    return interfaces
+
+
+# Active (ifOperStatus up) interfaces from rows with "estado" and "nombre"
+def build_active_interfaces(if_rows):
+    active = []
+    for if_index, row in sorted(if_rows.items()):
+        if row.get("estado") == 1:
+            active.append({
+                "nombre": decode_text(row.get("nombre", f"Unknown {if_index[0]}")),
+                "estado": "active"
+            })
+    return active
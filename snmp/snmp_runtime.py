@@ -0,0 +1,121 @@
+# Long-lived SNMP runtime shared by every client and service in the process
+import asyncio
+import atexit
+import threading
+from pysnmp.hlapi.v3arch.asyncio import SnmpEngine, UdpTransportTarget
+
+
+# Owns one background event loop, one SnmpEngine and the UDP transport targets.
+# pysnmp binds the engine dispatcher to the loop it was created on, so every
+# SNMP coroutine has to run on this loop; synchronous code (Flask views,
+# daemon threads) hands its coroutines over with run() or submit().
+class SnmpRuntime:
+    def __init__(self, timeout=1, retries=5):
+        self.timeout = timeout            # Response timeout per PDU (seconds)
+        self.retries = retries            # Retries before giving up on a PDU
+        self.loop = None
+        self.thread = None
+        self._engine = None
+        self._transports = {}             # (host, port) -> UdpTransportTarget
+        self.round_trips = 0              # Request PDUs sent through this runtime
+        self._lock = threading.Lock()
+
+    # Starts the loop thread on first use
+    def start(self):
+        with self._lock:
+            if self.thread is not None and self.thread.is_alive():
+                return self.loop
+
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run_loop():
+                asyncio.set_event_loop(self.loop)
+                self.loop.call_soon(ready.set)
+                self.loop.run_forever()
+
+            self.thread = threading.Thread(target=run_loop, name="snmp-runtime", daemon=True)
+            self.thread.start()
+            ready.wait()
+            return self.loop
+
+    # Shared engine; must be used from the runtime loop
+    @property
+    def engine(self):
+        self._check_loop()
+        if self._engine is None:
+            self._engine = SnmpEngine()
+        return self._engine
+
+    # Returns the cached transport target for a router, resolving it only once
+    async def get_transport(self, host, port=161):
+        self._check_loop()
+        key = (host, port)
+        transport = self._transports.get(key)
+        if transport is None:
+            transport = await UdpTransportTarget.create(
+                (host, port), timeout=self.timeout, retries=self.retries
+            )
+            self._transports[key] = transport
+        return transport
+
+    # Schedules a coroutine on the runtime loop and returns a concurrent Future
+    def submit(self, coro):
+        loop = self.start()
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    # Runs a coroutine on the runtime loop and blocks until it finishes
+    def run(self, coro, timeout=None):
+        if self._in_loop():
+            coro.close()
+            raise RuntimeError("SnmpRuntime.run() no puede llamarse desde el loop del runtime")
+        return self.submit(coro).result(timeout)
+
+    # Closes the engine dispatcher and stops the loop thread
+    def close(self):
+        with self._lock:
+            if self.thread is None:
+                return
+            loop, thread = self.loop, self.thread
+            self.thread = None
+
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+        loop.close()
+
+    async def _shutdown(self):
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        if self._engine is not None:
+            self._engine.close_dispatcher()
+            self._engine = None
+        self._transports.clear()
+
+    def _in_loop(self):
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def _check_loop(self):
+        if not self._in_loop():
+            raise RuntimeError("El motor SNMP compartido solo puede usarse desde el loop del runtime")
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+# Process-wide runtime, created on first use and closed at interpreter exit
+def get_snmp_runtime():
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = SnmpRuntime()
+            atexit.register(_runtime.close)
+        return _runtime
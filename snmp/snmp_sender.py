@@ -1,67 +1,117 @@
 # Import necessary libraries for asynchronous SNMP queries
 import asyncio
-from pysnmp.hlapi.v3arch.asyncio import (
-    SnmpEngine, UdpTransportTarget, CommunityData,
-    ContextData, ObjectType, ObjectIdentity,
-    get_cmd, next_cmd
+from pysnmp.entity.rfc3413 import cmdgen
+from pysnmp.hlapi.v3arch.asyncio import CommunityData
+from pysnmp.hlapi.v3arch.asyncio.lcd import CommandGeneratorLcdConfigurator
+from pysnmp.proto.rfc1902 import ObjectName, Null
+from pysnmp.proto.rfc1905 import EndOfMibView, NoSuchObject, NoSuchInstance
+from snmp.snmp_runtime import get_snmp_runtime
+from snmp.snmp_parser import (
+    build_interfaces, build_active_interfaces, to_native, decode_text, ip_from_octets
 )
-from pysnmp.smi import builder, view
-from pysnmp.proto.rfc1902 import ObjectName
+from snmp import oids
+from snmp.oids import as_oid
+from config import SNMP_MAX_REPETITIONS
+
+# Command generators and target configurator shared by every client. Requests
+# are sent with numeric varbinds and responses come back raw, so no MIB is
+# loaded or resolved while querying (see snmp/oids.py)
+GET = cmdgen.GetCommandGenerator()
+GET_NEXT = cmdgen.NextCommandGenerator()
+GET_BULK = cmdgen.BulkCommandGenerator()
+LCD = CommandGeneratorLcdConfigurator()
 
 # Main class to interact with a router using SNMP
 class RouterSNMPClient:
-    # Constructor
-    def __init__(self, host, name, community='public', port=161):
+    # Constructor. All queries run on the shared runtime loop (see snmp/snmp_runtime.py),
+    # reusing its SnmpEngine and transport targets instead of building new ones
+    def __init__(self, host, name, community='public', port=161, runtime=None,
+                 max_repetitions=SNMP_MAX_REPETITIONS):
         self.host = host                  # IP or hostname of the router
         self.community = community        # SNMP community string (default: 'public')
         self.port = port                  # SNMP port (default: 161)
         self.name = name                  # Name to identify the router
+        self.runtime = runtime or get_snmp_runtime()  # Shared engine/transport layer
+        self.max_repetitions = max_repetitions  # Rows requested per GETBULK PDU
+        self.round_trips = 0              # Request PDUs sent by this client
+        self.auth = CommunityData(community, mpModel=1)  # mpModel=1 means SNMPv2c
+
+    # Counts one request/response exchange on the client and on the runtime
+    def _count_round_trip(self):
+        self.round_trips += 1
+        self.runtime.round_trips += 1
+
+    # Value as returned to callers: native int/bytes/str on the typed path
+    # (see snmp_parser.to_native), prettyPrint() string otherwise
+    def _value(self, val, typed):
+        return to_native(val) if typed else val.prettyPrint()
+
+    # Sends one request PDU with the given OID tuples and waits for the response.
+    # max_repetitions turns it into a GETBULK. Returns
+    # (errorIndication, errorStatus, errorIndex, [(ObjectName, value), ...])
+    async def _request(self, generator, oid_list, max_repetitions=None):
+        snmpEngine = self.runtime.engine
+        transport = await self.runtime.get_transport(self.host, self.port)  # Cached transport
+        addrName, paramsName = LCD.configure(snmpEngine, self.auth, transport)
+        future = asyncio.get_running_loop().create_future()
+
+        def callback(snmpEngine, sendRequestHandle, errorIndication, errorStatus,
+                     errorIndex, varBinds, cbCtx):
+            if not future.cancelled():
+                future.set_result((errorIndication, errorStatus, errorIndex, varBinds))
+
+        varBinds = [(ObjectName(oid), Null('')) for oid in oid_list]
+        self._count_round_trip()
+        if max_repetitions is None:
+            generator.send_varbinds(snmpEngine, addrName, None, b'', varBinds, callback)
+        else:
+            generator.send_varbinds(snmpEngine, addrName, None, b'', 0, max_repetitions,
+                                    varBinds, callback)
+        return await future
 
     # Performs a single SNMP GET query for one OID
-    async def snmp_get(self, oid):
-        snmpEngine = SnmpEngine()
-        transport = await UdpTransportTarget.create((self.host, self.port))  # Set up transport
-        result = await get_cmd(
-            snmpEngine,
-            CommunityData(self.community, mpModel=1),  # mpModel=1 means SNMPv2c
-            transport,
-            ContextData(),
-            ObjectType(ObjectIdentity(oid))            # The OID to query
-        )
+    async def snmp_get(self, oid, typed=False):
+        result = await self._request(GET, [as_oid(oid)])
 
         errorIndication, errorStatus, errorIndex, varBinds = result
 
         if errorIndication or errorStatus:
             return None  # Return None if there was an error
-        return varBinds[0][1].prettyPrint()  # Return the value as a string
-
-    # Performs an SNMP WALK on a base OID (walks through sub-OIDs)
-    async def snmp_walk(self, oid):
-        snmpEngine = SnmpEngine()
-        result = []
-
-        transport = await UdpTransportTarget.create((self.host, self.port))
+        return self._value(varBinds[0][1], typed)  # String, or native value if typed
 
-        # Create a MIB view to resolve object names
-        mibViewController = view.MibViewController(snmpEngine.get_mib_builder())
+    # Performs a single SNMP GET for several OIDs (one PDU, one varbind per OID).
+    # Returns the values in request order, None for OIDs the agent does not have
+    async def snmp_get_many(self, oid_list, typed=False):
+        errorIndication, errorStatus, errorIndex, varBinds = await self._request(
+            GET, [as_oid(oid) for oid in oid_list]
+        )
 
-        base_oid_obj = ObjectIdentity(oid).resolveWithMib(mibViewController).getOid()
-        base_oid = ObjectName(base_oid_obj)
-        current_oid = ObjectIdentity(oid)
+        if errorIndication or errorStatus:
+            return None  # Return None if there was an error
+        return [
+            None if isinstance(val, (NoSuchObject, NoSuchInstance)) else self._value(val, typed)
+            for name, val in varBinds
+        ]
+
+    # Performs an SNMP WALK on a base OID (walks through sub-OIDs).
+    # With bulk=True each GETBULK PDU returns up to max_repetitions rows.
+    # Returns a list of (index, value) pairs, index being the tuple of
+    # sub-identifiers after the base OID
+    async def snmp_walk(self, oid, bulk=False, max_repetitions=None, typed=False):
+        if bulk:
+            return await self.snmp_bulk_walk(oid, max_repetitions, typed)
+
+        base_oid = as_oid(oid)
+        size = len(base_oid)
+        current_oid = base_oid
+        result = []
 
         while True:
             # Perform the next SNMP query in the hierarchy
-            iterator = next_cmd(
-                snmpEngine,
-                CommunityData(self.community, mpModel=1),
-                transport,
-                ContextData(),
-                ObjectType(current_oid),
-                lexicographicMode=False
+            errorIndication, errorStatus, errorIndex, varBinds = await self._request(
+                GET_NEXT, [current_oid]
             )
 
-            errorIndication, errorStatus, errorIndex, varBinds = await iterator
-
             if errorIndication:
                 print(f"Error: {errorIndication}")
                 break
@@ -71,90 +121,106 @@ class RouterSNMPClient:
             elif not varBinds:
                 break
             else:
-                for varBind in varBinds:
-                    name, val = varBind
-                    current_oid_obj = ObjectName(name)
+                for name, val in varBinds:
+                    name = tuple(name)
+
+                    # Stop at the end of the MIB or if OID is outside the base OID subtree
+                    if isinstance(val, EndOfMibView) or name[:size] != base_oid:
+                        return result
+
+                    result.append((name[size:], self._value(val, typed)))
+                    current_oid = name
+
+        return result  # Returns a list of (index, value) tuples
+
+    # WALK built on GETBULK: one round trip per max_repetitions rows instead of one per row
+    async def snmp_bulk_walk(self, oid, max_repetitions=None, typed=False):
+        rows = await self.snmp_table({"valor": oid}, max_repetitions, typed)
+        return [(index, row["valor"]) for index, row in rows.items()]
+
+    # Walks several columns of a conceptual table in the same GETBULK PDUs.
+    # columns maps a field name to its column OID; returns {index: {field: value}}
+    # where index is the tuple of sub-identifiers after the column OID
+    async def snmp_table(self, columns, max_repetitions=None, typed=False):
+        max_repetitions = max_repetitions or self.max_repetitions
+        rows = {}
+
+        base_oids = {field: as_oid(oid) for field, oid in columns.items()}
+        cursors = dict(base_oids)
+
+        # Columns still inside their subtree; finished ones drop out of the next PDU
+        while cursors:
+            active = list(cursors)
+            errorIndication, errorStatus, errorIndex, varBinds = await self._request(
+                GET_BULK, [cursors[field] for field in active], max_repetitions
+            )
+
+            if errorIndication:
+                print(f"Error: {errorIndication}")
+                break
+            elif errorStatus:
+                print(f"Error Status: {errorStatus.prettyPrint()}")
+                break
+            elif not varBinds:
+                break
+
+            # The response is row-major: one varbind per requested column per repetition
+            finished = set()
+            for position, (name, val) in enumerate(varBinds):
+                field = active[position % len(active)]
+                if field in finished:
+                    continue
 
-                    if not current_oid_obj[:len(base_oid)] == base_oid:
-                        return result  # Stop if OID is outside the base OID subtree
+                base_oid = base_oids[field]
+                size = len(base_oid)
+                name = tuple(name)
+                if isinstance(val, EndOfMibView) or name[:size] != base_oid:
+                    finished.add(field)
+                    continue
 
-                    result.append((str(name), val.prettyPrint()))
-                    current_oid = ObjectIdentity(name)
+                rows.setdefault(name[size:], {})[field] = self._value(val, typed)
+                cursors[field] = name
 
-        return result  # Returns a list of (OID, value) tuples
+            for field in finished:
+                del cursors[field]
+
+        return rows
 
     # Retrieves detailed information about the router's interfaces
     async def get_interface_info(self):
-        # Query multiple interface attributes
-        if_types = await self.snmp_walk('1.3.6.1.2.1.2.2.1.3')   # Interface type
-        if_statuses = await self.snmp_walk('1.3.6.1.2.1.2.2.1.8') # Interface status
-        if_names = await self.snmp_walk('1.3.6.1.2.1.31.1.1.1.1') # Logical interface name
-
-        ip_to_index = await self.snmp_walk('1.3.6.1.2.1.4.20.1.2') # Maps IPs to interface index
-        subnet_masks = await self.snmp_walk('1.3.6.1.2.1.4.20.1.3') # Maps IPs to subnet masks
-
-        interfaces = []
-
-        for name_oid, name in if_names:
-            index = int(name_oid.split('.')[-1])  # Extract interface index
-            type_oid = f'1.3.6.1.2.1.2.2.1.3.{index}'
-            status_oid = f'1.3.6.1.2.1.2.2.1.8.{index}'
-
-            tipo = next((v for k, v in if_types if k.endswith(f'.{index}')), 'unknown')
-            estado_val = next((v for k, v in if_statuses if k.endswith(f'.{index}')), 'unknown')
-
-            # Map SNMP status code to human-readable text
-            estado = {
-                '1': 'up',
-                '2': 'down',
-                '3': 'testing'
-            }.get(estado_val, 'unknown')
-
-            ip = None
-            mask = None
-
-            for ip_oid, idx in ip_to_index:
-                if int(idx) == index:
-                    ip_parts = ip_oid.split('.')[-4:]  # Extract IP address from OID
-                    ip = '.'.join(ip_parts)
-                    mask = next((m for k, m in subnet_masks if k.endswith(ip)), None)
-                    break
-
-            interfaces.append({
-                "nombre": name,
-                "numero": index,
-                "tipo": tipo,
-                "ip": ip or "Unassigned",
-                "mascara": mask or "Unknown",
-                "estado": estado
-            })
+        # ifTable and ifXTable share the ifIndex, so their columns go in the same PDUs;
+        # ipAddrTable is indexed by IP address and is walked alongside
+        if_rows, ip_rows = await asyncio.gather(
+            self.snmp_table({
+                "tipo": oids.IF_TYPE,          # Interface type
+                "estado": oids.IF_OPER_STATUS,  # Interface status
+                "nombre": oids.IF_NAME,          # Logical interface name
+            }, typed=True),
+            self.snmp_table({
+                "indice": oids.IP_AD_ENT_IF_INDEX,  # Maps IPs to interface index
+                "mascara": oids.IP_AD_ENT_NET_MASK,  # Maps IPs to subnet masks
+            }, typed=True)
+        )
+
+        # Index-keyed join of both tables (see snmp/snmp_parser.py)
+        interfaces = build_interfaces(if_rows, ip_rows)
 
         return interfaces  # List of interfaces with detailed info
 
     # Retrieves general information about the router: system name, OS, active interfaces, etc.
     async def get_general_info(self, rol=None, empresa=None):
-        nombre = await self.snmp_get('1.3.6.1.2.1.1.5.0')         # System name
-        hex_os = await self.snmp_get('1.3.6.1.2.1.1.1.0')         # OS in hexadecimal format
-        decoded_os = self.decode_hex_string(hex_os)              # Decode hex to readable string
-        
-        status_list = await self.snmp_walk('1.3.6.1.2.1.2.2.1.8') # Interface status list
-        names_list = await self.snmp_walk('1.3.6.1.2.1.2.2.1.2')  # Interface name list
-
-        # Map interface index to names
-        interface_names = {
-            int(oid.split('.')[-1]): name
-            for oid, name in names_list
-        }
+        nombre = await self.snmp_get(oids.SYS_NAME, typed=True)      # System name
+        sys_descr = await self.snmp_get(oids.SYS_DESCR, typed=True)   # OS description (raw bytes)
+        nombre = decode_text(nombre)
+        decoded_os = decode_text(sys_descr)
+
+        # Interface status and name in a single table walk
+        if_rows = await self.snmp_table({
+            "estado": oids.IF_OPER_STATUS,   # Interface status
+            "nombre": oids.IF_DESCR,         # Interface name
+        }, typed=True)
 
-        interfaces_status = []
-        for oid, state in status_list:
-            index = int(oid.split('.')[-1])
-            if state == '1':  # Only include active interfaces
-                int_name = interface_names.get(index, f"Unknown {index}")
-                interfaces_status.append({
-                    "nombre": int_name,
-                    "estado": "active"
-                })
+        interfaces_status = build_active_interfaces(if_rows)
 
         # Return all general information
         return {
@@ -178,17 +244,20 @@ class RouterSNMPClient:
     
     async def get_router_neighbors(self):
         try:
-            # Obtener nombres de los vecinos (routers)
-            names = await self.snmp_walk('1.3.6.1.4.1.9.9.23.1.2.1.1.6')  # Neighbor name
-            # Obtener las IPs de los vecinos
-            ips = await self.snmp_walk('1.3.6.1.4.1.9.9.23.1.2.1.1.4')  # Neighbor IP
+            # Nombre e IP de cada vecino CDP, en la misma fila (ifIndex, deviceIndex)
+            rows = await self.snmp_table({
+                "nombre": oids.CDP_CACHE_DEVICE_ID,  # Neighbor name
+                "ip": oids.CDP_CACHE_ADDRESS,        # Neighbor IP
+            }, typed=True)
 
             # Filtrar y obtener solo los routers, ya que no hay más detalles necesarios
             routers = []
-            for i in range(len(names)):
+            for row in rows.values():
+                if "nombre" not in row:
+                    continue
                 router = {
-                    "nombre": names[i][1],
-                    "ip": self.parse_ip_from_hex(ips[i][1])
+                    "nombre": decode_text(row["nombre"]),
+                    "ip": ip_from_octets(row.get("ip"))
                 }
                 routers.append(router)
 
@@ -197,50 +266,12 @@ class RouterSNMPClient:
             print(f"Error obteniendo vecinos CDP: {e}")
             return []
     
-    async def discover_network(self, visited=None, discovered=None):
-        if visited is None:
-            visited = set()
-        if discovered is None:
-            discovered = set()
-
-        if self.host in visited:
-            return set()
-
-        visited.add(self.host)
-        discovered.add(self.name)  # mark the router name as discovered
-
-        neighbors = await self.get_router_neighbors()
-
-        connections = set()
-
-        # Only add connection if the neighbor will be reachable
-        for neighbor in neighbors:
-            from_device = self.name
-            to_device = neighbor["nombre"]
-
-            connections.add((from_device, to_device))
-
-        # Now visit neighbors recursively
-        for neighbor in neighbors:
-            ip = neighbor["ip"]
-            name = neighbor["nombre"]
-
-            if ip and ip not in visited:
-                new_client = RouterSNMPClient(ip, name, self.community, self.port)
-                try:
-                    new_connections = await new_client.discover_network(visited, discovered)
-                    connections.update(new_connections)
-                except Exception as e:
-                    print(f"Could not access {ip}: {e}")
-
-        # Final filtering step: only keep connections where both routers were discovered
-        final_connections = set()
-        for a, b in connections:
-            if a in discovered and b in discovered:
-                # sort to avoid duplicates (R1,R2) and (R2,R1)
-                final_connections.add(tuple(sorted((a, b))))
-
-        return final_connections
+    # Discovers the network reachable from this router (breadth-first, see snmp/discovery.py)
+    async def discover_network(self):
+        from snmp.discovery import NetworkDiscovery  # Avoids a circular import
+
+        discovery = NetworkDiscovery(self.community, self.port, self.runtime)
+        return await discovery.discover(self.host, self.name)
 
     def parse_ip_from_hex(self, hex_str):
         """Convierte un string hex a una dirección IP (ej. '0xC0A80101' -> '192.168.1.1')"""